@@ -13,7 +13,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from database import Base, DATABASE_URL
-from database import User, Measurement  # Import all models
+from database import User, Measurement, TrainingData, TrainingDataStats, TrainingImport, Blob, RefreshToken  # Import all models
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
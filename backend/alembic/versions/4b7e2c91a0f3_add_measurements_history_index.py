@@ -0,0 +1,30 @@
+"""Add composite index for measurement history pagination
+
+Revision ID: 4b7e2c91a0f3
+Revises: d36355bc9ec5
+Create Date: 2026-10-18 16:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2c91a0f3'
+down_revision: Union[str, None] = 'd36355bc9ec5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_measurements_user_created_id',
+        'measurements',
+        ['user_id', 'created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_measurements_user_created_id', table_name='measurements')
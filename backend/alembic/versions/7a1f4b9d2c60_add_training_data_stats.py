@@ -0,0 +1,53 @@
+"""Add training_data_stats counters
+
+Revision ID: 7a1f4b9d2c60
+Revises: 5e8a1c3d7b20
+Create Date: 2026-10-18 17:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a1f4b9d2c60'
+down_revision: Union[str, None] = '5e8a1c3d7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    stats = op.create_table('training_data_stats',
+    sa.Column('is_verified', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('sum_systolic', sa.Float(precision=53), nullable=False),
+    sa.Column('sum_diastolic', sa.Float(precision=53), nullable=False),
+    sa.Column('min_systolic', sa.Float(), nullable=True),
+    sa.Column('max_systolic', sa.Float(), nullable=True),
+    sa.Column('min_diastolic', sa.Float(), nullable=True),
+    sa.Column('max_diastolic', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('is_verified')
+    )
+    # تعبئة العدادات من البيانات الحالية (training_data قد يُنشأ عبر init_db)
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table('training_data'):
+        op.execute(
+            "INSERT INTO training_data_stats (is_verified, count, sum_systolic, sum_diastolic, "
+            "min_systolic, max_systolic, min_diastolic, max_diastolic, updated_at) "
+            "SELECT is_verified, COUNT(*), SUM(systolic), SUM(diastolic), MIN(systolic), "
+            "MAX(systolic), MIN(diastolic), MAX(diastolic), CURRENT_TIMESTAMP "
+            "FROM training_data WHERE is_verified IN (0, 1) GROUP BY is_verified"
+        )
+    # الحالات بدون صفوف تبدأ من الصفر
+    existing = {row[0] for row in bind.execute(sa.text("SELECT is_verified FROM training_data_stats"))}
+    op.bulk_insert(stats, [
+        {'is_verified': status, 'count': 0, 'sum_systolic': 0.0, 'sum_diastolic': 0.0}
+        for status in (0, 1) if status not in existing
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('training_data_stats')
@@ -0,0 +1,46 @@
+"""Add training_imports table for resumable bulk imports
+
+Revision ID: b3d9e2f4a871
+Revises: 7a1f4b9d2c60
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d9e2f4a871'
+down_revision: Union[str, None] = '7a1f4b9d2c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('training_imports',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('archive_sha256', sa.String(length=64), nullable=False),
+    sa.Column('archive_name', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('rows_total', sa.Integer(), nullable=False),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('rows_imported', sa.Integer(), nullable=False),
+    sa.Column('rows_rejected', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_training_imports_id'), 'training_imports', ['id'], unique=False)
+    op.create_index(op.f('ix_training_imports_user_id'), 'training_imports', ['user_id'], unique=False)
+    op.create_index('ux_training_imports_user_archive', 'training_imports', ['user_id', 'archive_sha256'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_training_imports_user_archive', table_name='training_imports')
+    op.drop_index(op.f('ix_training_imports_user_id'), table_name='training_imports')
+    op.drop_index(op.f('ix_training_imports_id'), table_name='training_imports')
+    op.drop_table('training_imports')
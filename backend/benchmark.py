@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+"""
+سكريبت لقياس أداء الـ API تحت حمل متزامن (طلبات/ثانية وزمن الاستجابة)
+
+Usage:
+    python benchmark.py run                                   # خادم محلي + SQLite + نموذج بديل
+    python benchmark.py run --model real --duration 60        # النموذج الحقيقي
+    python benchmark.py run --mix measure=8,history=2 --concurrency 32 --output after.json
+    python benchmark.py run --url http://localhost:8000       # خادم يعمل مسبقاً
+    python benchmark.py compare before.json after.json        # مقارنة نتيجتين
+    python benchmark.py serve --port 8001                     # الخادم فقط (قاعدة البيانات من البيئة)
+
+run يشغل uvicorn (عامل واحد) في عملية منفصلة على قاعدة SQLite ومجلد صور
+مؤقتين بدلاً من MySQL، مع نموذج بديل بنفس واجهة predict_on_batch (زمن ثابت
+عبر --stub-latency-ms) أو النموذج الحقيقي. بعد تسجيل المستخدمين وفترة إحماء
+غير محسوبة، يرسل --concurrency عميلاً متزامناً عمليات عشوائية حسب أوزان --mix
+(register / login / measure / history) لمدة --duration ثانية.
+
+كل /api/measure يرسل صورة جديدة افتراضياً، فلا يصيب كاش التنبؤات ويُقاس
+الاستدلال فعلاً (--images N لمجموعة ثابتة من الصور).
+
+النتيجة JSON: عدد الطلبات والأخطاء والطلبات/ثانية و p50/p90/p95/p99 لكل
+عملية، و hit/miss كاش التنبؤات أثناء القياس، مع commit و الإعدادات والبيئة
+وإحصائيات الخادم (الدفعات، الـ pools، الكاش، قاعدة البيانات). الصور والعمليات
+تُولد من --seed ثابت، فالتشغيل بنفس الإعدادات على commits مختلفة قابل
+للمقارنة عبر compare.
+"""
+import sys
+import os
+import json
+import time
+import socket
+import random
+import shutil
+import asyncio
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+# إضافة مسار backend إلى Python path
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+RESULT_VERSION = 2
+OPERATIONS = ('register', 'login', 'measure', 'history')
+DEFAULT_MIX = 'register=1,login=1,measure=6,history=2'
+PERCENTILES = (50, 90, 95, 99)
+PASSWORD = 'benchmark-password'
+SERVER_STATS = {
+    'inference': '/api/inference/stats',
+    'pools': '/api/pools/stats',
+    'cache': '/api/cache/stats',
+    'db': '/api/db/stats',
+}
+
+
+# ---------------------------------------------------------------------------
+# الخادم
+# ---------------------------------------------------------------------------
+
+class StubModel:
+    """بديل النموذج بنفس واجهة predict_on_batch وزمن ثابت لكل دفعة"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+
+    def predict_on_batch(self, images):
+        import numpy as np
+        if self.latency:
+            time.sleep(self.latency)
+        brightness = np.asarray(images, dtype=np.float32).reshape(len(images), -1).mean(axis=1)
+        return np.stack([120 + brightness / 10, 80 + brightness / 20], axis=1)
+
+
+def serve(args):
+    """تشغيل التطبيق في هذه العملية (يستدعيه run في عملية منفصلة)"""
+    import uvicorn
+
+    if args.model == 'stub':
+        from models.blood_pressure_model import BloodPressureCNN
+        BloodPressureCNN._load = lambda self: StubModel(args.stub_latency_ms)
+
+    import main
+    # تحميل النموذج قبل أول طلب حتى لا يُحسب في الإحماء
+    main.bp_model.load_model()
+    uvicorn.run(main.app, host=args.host, port=args.port, log_level='warning', access_log=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def parse_env(pairs):
+    env = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep:
+            raise SystemExit(f"❌ --server-env يجب أن يكون KEY=VALUE: {pair}")
+        env[key] = value
+    return env
+
+
+def start_server(args, work_dir):
+    """تشغيل الخادم المحلي على SQLite ومجلد صور مؤقتين. يُرجع (process, url, log_path)"""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}",
+        'UPLOAD_DIR': os.path.join(work_dir, 'uploads'),
+    })
+    env.pop('ASYNC_DATABASE_URL', None)
+    env.update(parse_env(args.server_env))
+
+    command = [
+        sys.executable, os.path.abspath(__file__), 'serve',
+        '--host', '127.0.0.1', '--port', str(port),
+        '--model', args.model, '--stub-latency-ms', str(args.stub_latency_ms),
+    ]
+    log_path = os.path.join(work_dir, 'server.log')
+    with open(log_path, 'wb') as log:
+        process = subprocess.Popen(command, cwd=backend_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, f"http://127.0.0.1:{port}", log_path
+
+
+async def wait_until_ready(client, process=None, timeout=180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"الخادم توقف (exit code {process.returncode})")
+        try:
+            if (await client.get('/')).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"الخادم لم يستجب خلال {timeout} ثانية")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# ---------------------------------------------------------------------------
+# الحمل
+# ---------------------------------------------------------------------------
+
+def parse_mix(text):
+    """register=1,measure=6 -> {'register': 1.0, 'measure': 6.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, sep, weight = part.strip().partition('=')
+        if name not in OPERATIONS or not sep:
+            raise SystemExit(f"❌ --mix غير صالح: {part!r} (العمليات: {', '.join(OPERATIONS)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise SystemExit(f"❌ وزن غير صالح في --mix: {part!r}")
+        if mix[name] < 0:
+            raise SystemExit(f"❌ وزن سالب في --mix: {part!r}")
+    if not any(mix.values()):
+        raise SystemExit("❌ --mix يجب أن يحتوي وزناً موجباً واحداً على الأقل")
+    return mix
+
+
+def make_image(seed, width, height):
+    """صورة JPEG عشوائية (نفس seed = نفس الصورة)"""
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    # نقاط عشوائية مكبرة: محتوى يشبه الصور أكثر من الضجيج الخالص في حجم JPEG
+    small = rng.integers(0, 256, (max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8)
+    pixels = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+    return cv2.imencode('.jpg', pixels, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+class ImageSource:
+    """
+    صور القياس: صورة جديدة لكل طلب افتراضياً حتى يمر كل قياس بالاستدلال
+    فعلاً، أو مجموعة ثابتة من pool صورة (تصيب كاش التنبؤات بعد أول مرور)
+    """
+
+    def __init__(self, width, height, pool=0, seed=0):
+        self.width = width
+        self.height = height
+        self.pool = [make_image((seed, index), width, height) for index in range(pool)]
+
+    def next(self, rng):
+        if self.pool:
+            return rng.choice(self.pool)
+        return make_image(rng.getrandbits(64), self.width, self.height)
+
+
+def percentile(sorted_values, q):
+    """percentile بالاستيفاء الخطي (مثل numpy.percentile)"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def latency_summary(latencies):
+    values = sorted(latencies)
+    if not values:
+        return None
+    summary = {'mean': sum(values) / len(values)}
+    for q in PERCENTILES:
+        summary[f'p{q}'] = percentile(values, q)
+    summary['max'] = values[-1]
+    return {key: round(value * 1000, 3) for key, value in summary.items()}
+
+
+class Workload:
+    """عمليات الحمل وتسجيل نتائجها (زمن كل طلب وحالته)"""
+
+    def __init__(self, client, images, run_id):
+        self.client = client
+        self.images = images         # ImageSource
+        self.run_id = run_id
+        self.users = []              # [(email, access_token)]
+        self.registered = 0
+        self.recording = False
+        self.samples = {name: [] for name in OPERATIONS}   # (status, seconds)
+
+    async def _timed(self, name, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+            status = response.status_code
+        except Exception as e:
+            response, status = None, type(e).__name__
+        elapsed = time.perf_counter() - started
+        if self.recording:
+            self.samples[name].append((status, elapsed))
+        return response
+
+    def _new_email(self):
+        self.registered += 1
+        return f"bench-{self.run_id}-{self.registered}@example.com"
+
+    async def register(self, rng, user):
+        email = self._new_email()
+        response = await self._timed('register', self.client.post(
+            '/api/auth/register', json={'name': 'Benchmark', 'email': email, 'password': PASSWORD},
+        ))
+        return email, response
+
+    async def login(self, rng, user):
+        email, _ = rng.choice(self.users)
+        await self._timed('login', self.client.post(
+            '/api/auth/login', data={'username': email, 'password': PASSWORD},
+        ))
+
+    async def measure(self, rng, user):
+        # توليد الصورة خارج الزمن المقاس
+        image = self.images.next(rng)
+        await self._timed('measure', self.client.post(
+            '/api/measure', headers=self._auth(user),
+            files={'image': ('frame.jpg', image, 'image/jpeg')},
+        ))
+
+    async def history(self, rng, user):
+        await self._timed('history', self.client.get(
+            '/api/history', headers=self._auth(user), params={'limit': 50},
+        ))
+
+    def _auth(self, user):
+        return {'Authorization': f"Bearer {self.users[user][1]}"}
+
+    async def create_users(self, count, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create():
+            async with semaphore:
+                email, response = await self.register(None, None)
+                if response is None or response.status_code != 200:
+                    raise RuntimeError(f"فشل تسجيل مستخدم الاختبار: {getattr(response, 'text', response)}")
+                self.users.append((email, response.json()['access_token']))
+
+        await asyncio.gather(*(create() for _ in range(count)))
+
+    async def drive(self, mix, concurrency, seconds=None, requests=None, seed=0):
+        """--concurrency عميل بحلقة مغلقة (طلب جديد بعد انتهاء السابق)"""
+        names = [name for name in mix if mix[name] > 0]
+        weights = [mix[name] for name in names]
+        deadline = time.perf_counter() + seconds if seconds else None
+        issued = 0
+
+        async def worker(index):
+            nonlocal issued
+            rng = random.Random(seed * 1000003 + index)
+            user = index % len(self.users)
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                if requests is not None:
+                    if issued >= requests:
+                        return
+                    issued += 1
+                await getattr(self, rng.choices(names, weights)[0])(rng, user)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        operations = {}
+        all_ok, all_requests, all_errors = [], 0, 0
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            ok = [seconds for status, seconds in samples if status == 200]
+            errors = {}
+            for status, _ in samples:
+                if status != 200:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+            operations[name] = {
+                'requests': len(samples),
+                'errors': sum(errors.values()),
+                'errors_by_status': errors,
+                'throughput_rps': round(len(ok) / elapsed, 3),
+                'latency_ms': latency_summary(ok),
+            }
+            all_ok.extend(ok)
+            all_requests += len(samples)
+            all_errors += sum(errors.values())
+        totals = {
+            'requests': all_requests,
+            'errors': all_errors,
+            'throughput_rps': round(len(all_ok) / elapsed, 3),
+            'latency_ms': latency_summary(all_ok),
+        }
+        return totals, operations
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=backend_dir, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=backend_dir, capture_output=True, text=True, check=True,
+        ).stdout.strip() != ''
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': dirty}
+
+
+async def fetch_server_stats(client):
+    stats = {}
+    for name, path in SERVER_STATS.items():
+        try:
+            response = await client.get(path)
+            stats[name] = response.json() if response.status_code == 200 else None
+        except Exception:
+            stats[name] = None
+    return stats
+
+
+def cache_delta(before, after):
+    """hit / miss لكاش التنبؤات خلال فترة القياس (من /api/cache/stats قبلها وبعدها)"""
+    try:
+        old, new = before['cache']['predictions'], after['cache']['predictions']
+        hits = new['hits'] - old['hits']
+        misses = new['misses'] - old['misses']
+        coalesced = new['singleflight']['coalesced'] - old['singleflight']['coalesced']
+    except (KeyError, TypeError):
+        return None
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        'singleflight_coalesced': coalesced,
+    }
+
+
+async def run_benchmark(args, url, process=None):
+    import httpx
+
+    mix = parse_mix(args.mix)
+    width, height = (int(value) for value in args.image_size.lower().split('x'))
+    images = ImageSource(width, height, pool=args.images, seed=args.seed)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        await wait_until_ready(client, process)
+        workload = Workload(client, images, run_id=f"{int(time.time())}-{os.getpid()}")
+
+        log(f"👥 تسجيل {args.users} مستخدم...")
+        await workload.create_users(args.users, args.concurrency)
+
+        if args.warmup > 0:
+            log(f"🔥 إحماء {args.warmup} ثانية...")
+            await workload.drive(mix, args.concurrency, seconds=args.warmup, seed=args.seed + 1)
+
+        log(f"🚀 قياس: {args.concurrency} عميل متزامن, mix={args.mix}")
+        stats_before = await fetch_server_stats(client)
+        workload.recording = True
+        elapsed = await workload.drive(
+            mix, args.concurrency,
+            seconds=None if args.requests else args.duration,
+            requests=args.requests, seed=args.seed,
+        )
+        workload.recording = False
+
+        server_stats = await fetch_server_stats(client)
+
+    totals, operations = workload.report(elapsed)
+    return {
+        'version': RESULT_VERSION,
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {
+            'target': args.url or 'local',
+            'model': None if args.url else args.model,
+            'stub_latency_ms': args.stub_latency_ms if not args.url and args.model == 'stub' else None,
+            'server_env': parse_env(args.server_env),
+            'mix': mix,
+            'concurrency': args.concurrency,
+            'users': args.users,
+            'duration': None if args.requests else args.duration,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'images': args.images,
+            'image_size': args.image_size,
+            'seed': args.seed,
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'totals': totals,
+        'operations': operations,
+        'prediction_cache': cache_delta(stats_before, server_stats),
+        'server': server_stats,
+    }
+
+
+def log(message):
+    # التقدم على stderr حتى يبقى stdout نتيجة JSON فقط
+    print(message, file=sys.stderr, flush=True)
+
+
+def print_summary(result):
+    log("=" * 60)
+    for name, operation in result['operations'].items():
+        latency = operation['latency_ms'] or {}
+        log(
+            f"📊 {name:<9} {operation['throughput_rps']:>9.1f} req/s  "
+            f"p50 {latency.get('p50', 0):>8.1f}ms  p99 {latency.get('p99', 0):>8.1f}ms  "
+            f"أخطاء: {operation['errors']}"
+        )
+    cache = result.get('prediction_cache')
+    if cache:
+        log(
+            f"🗃️ كاش التنبؤات: hits {cache['hits']}, misses {cache['misses']}, "
+            f"hit_rate {cache['hit_rate']}, singleflight {cache['singleflight_coalesced']}"
+        )
+    totals = result['totals']
+    log(f"✅ الإجمالي: {totals['requests']} طلب, {totals['throughput_rps']:.1f} req/s, أخطاء: {totals['errors']}")
+
+
+def run(args):
+    if args.users is None:
+        args.users = args.concurrency
+
+    work_dir = None
+    process = None
+    url = args.url
+    try:
+        if url is None:
+            work_dir = tempfile.mkdtemp(prefix='bp-benchmark-')
+            process, url, log_path = start_server(args, work_dir)
+            log(f"🖥️ خادم محلي: {url} (model={args.model}, SQLite: {work_dir})")
+        try:
+            result = asyncio.run(run_benchmark(args, url, process))
+        except Exception:
+            if process is not None:
+                with open(log_path, 'rb') as f:
+                    log(f.read()[-4000:].decode('utf-8', 'replace'))
+            raise
+    finally:
+        if process is not None:
+            stop_server(process)
+        if work_dir is not None and not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_summary(result)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        log(f"📄 النتيجة: {args.output}")
+    else:
+        print(text)
+
+
+# ---------------------------------------------------------------------------
+# المقارنة
+# ---------------------------------------------------------------------------
+
+def _change(before, after):
+    if before is None or after is None:
+        return '     n/a'
+    if not before:
+        return '     new'
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def compare(args):
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+
+    ignored = {'target'}
+    differing = sorted(
+        key for key in set(before['config']) | set(after['config'])
+        if key not in ignored and before['config'].get(key) != after['config'].get(key)
+    )
+    print(f"📦 before: {(before['git']['commit'] or '?')[:12]}  after: {(after['git']['commit'] or '?')[:12]}")
+    if differing:
+        print(f"⚠️ إعدادات مختلفة (المقارنة قد لا تكون عادلة): {', '.join(differing)}")
+    if before.get('version') != after.get('version'):
+        print("⚠️ إصدار صيغة النتيجة مختلف (قد تختلف طريقة القياس)")
+    if before['environment'] != after['environment']:
+        print("⚠️ البيئة مختلفة (python / platform / cpu_count)")
+
+    rows = [('total', before['totals'], after['totals'])]
+    for name in OPERATIONS:
+        if name in before['operations'] or name in after['operations']:
+            rows.append((name, before['operations'].get(name), after['operations'].get(name)))
+
+    print(f"{'':<9} {'req/s':>22} {'p50 ms':>22} {'p99 ms':>22}")
+    for name, old, new in rows:
+        cells = []
+        for metric in ('throughput_rps', 'p50', 'p99'):
+            def value(entry):
+                if not entry:
+                    return None
+                if metric == 'throughput_rps':
+                    return entry['throughput_rps']
+                return (entry.get('latency_ms') or {}).get(metric)
+            old_value, new_value = value(old), value(new)
+            shown = f"{new_value:.1f}" if new_value is not None else '-'
+            cells.append(f"{shown:>12} {_change(old_value, new_value)}")
+        print(f"{name:<9} " + ' '.join(cells))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="قياس أداء الـ API تحت حمل متزامن")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_server_options(command):
+        command.add_argument('--model', choices=['stub', 'real'], default='stub',
+                             help="نموذج بديل بزمن ثابت أو BloodPressureCNN الحقيقي")
+        command.add_argument('--stub-latency-ms', type=float, default=0.0,
+                             help="زمن كل دفعة في النموذج البديل (محاكاة زمن VGG16)")
+
+    run_parser = commands.add_parser('run', help="تشغيل الحمل وكتابة النتيجة JSON")
+    add_server_options(run_parser)
+    run_parser.add_argument('--url', default=None,
+                            help="خادم يعمل مسبقاً بدلاً من تشغيل خادم محلي على SQLite")
+    run_parser.add_argument('--server-env', action='append', metavar='KEY=VALUE',
+                            help="متغير بيئة للخادم المحلي (مثلاً INFERENCE_MAX_BATCH_SIZE=32)، يمكن تكراره")
+    run_parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f"أوزان العمليات (الافتراضي: {DEFAULT_MIX})")
+    run_parser.add_argument('--concurrency', type=int, default=16,
+                            help="عدد العملاء المتزامنين")
+    run_parser.add_argument('--users', type=int, default=None,
+                            help="عدد المستخدمين المسجلين قبل القياس (الافتراضي: --concurrency)")
+    run_parser.add_argument('--duration', type=float, default=30.0,
+                            help="مدة القياس بالثواني")
+    run_parser.add_argument('--requests', type=int, default=None,
+                            help="عدد طلبات ثابت بدلاً من --duration")
+    run_parser.add_argument('--warmup', type=float, default=5.0,
+                            help="ثواني إحماء غير محسوبة قبل القياس")
+    run_parser.add_argument('--images', type=int, default=0,
+                            help="عدد صور القياس الثابتة؛ 0 (الافتراضي) = صورة جديدة لكل طلب "
+                                 "حتى لا يصيب القياس كاش التنبؤات")
+    run_parser.add_argument('--image-size', default='640x480',
+                            help="أبعاد صور القياس WIDTHxHEIGHT")
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--timeout', type=float, default=60.0,
+                            help="مهلة كل طلب بالثواني")
+    run_parser.add_argument('--output', default=None,
+                            help="ملف النتيجة JSON (الافتراضي: stdout)")
+    run_parser.add_argument('--keep', action='store_true',
+                            help="الإبقاء على قاعدة SQLite ومجلد الصور وسجل الخادم المؤقتة")
+
+    compare_parser = commands.add_parser('compare', help="مقارنة نتيجتين JSON")
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+
+    serve_parser = commands.add_parser('serve', help="تشغيل الخادم فقط (يستخدمه run)")
+    add_server_options(serve_parser)
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8001)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'serve':
+        serve(args)
+    elif args.command == 'compare':
+        compare(args)
+    else:
+        log("=" * 60)
+        log("⏱️ قياس أداء الـ API")
+        log("=" * 60)
+        try:
+            run(args)
+        except Exception as e:
+            log(f"❌ خطأ في القياس: {e}")
+            sys.exit(1)
@@ -1,29 +1,42 @@
 #!/usr/bin/env python3
 """
 سكريبت للتحقق من بيانات التدريب في قاعدة البيانات
+
+الإحصائيات تُقرأ من العدادات المحدثة (training_stats.py) وليس من training_data.
+
+Usage:
+    python check_training_data.py
+    python check_training_data.py --verify 12 13     # تغيير حالة صفوف إلى محققة
+    python check_training_data.py --unverify 14
+    python check_training_data.py --rebuild          # إعادة بناء العدادات من training_data
 """
 import sys
 import os
+import argparse
 
 backend_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, backend_dir)
 
-from database import SessionLocal, TrainingData
-from sqlalchemy import func
+from database import SessionLocal, TrainingDataStats
+from training_stats import (
+    MINIMUM_REQUIRED,
+    ensure_training_data_stats,
+    rebuild_training_data_stats,
+    set_verified,
+    summarize,
+)
 
 def check_training_data():
     """التحقق من بيانات التدريب"""
+    ensure_training_data_stats()
     db = SessionLocal()
     
     try:
-        # إحصائيات عامة
-        total = db.query(TrainingData).count()
-        verified = db.query(TrainingData).filter(
-            TrainingData.is_verified == 1
-        ).count()
-        pending = db.query(TrainingData).filter(
-            TrainingData.is_verified == 0
-        ).count()
+        # إحصائيات عامة (صفان من training_data_stats)
+        stats = summarize(db.query(TrainingDataStats).all())
+        total = stats['total']
+        verified = stats['verified']
+        pending = stats['pending']
         
         print("=" * 60)
         print("📊 إحصائيات بيانات التدريب")
@@ -39,26 +52,18 @@ def check_training_data():
             return
         
         # إحصائيات القياسات
-        stats = db.query(
-            func.avg(TrainingData.systolic).label('avg_systolic'),
-            func.avg(TrainingData.diastolic).label('avg_diastolic'),
-            func.min(TrainingData.systolic).label('min_systolic'),
-            func.max(TrainingData.systolic).label('max_systolic'),
-            func.min(TrainingData.diastolic).label('min_diastolic'),
-            func.max(TrainingData.diastolic).label('max_diastolic'),
-        ).filter(
-            TrainingData.is_verified == 1
-        ).first()
+        systolic = stats['systolic']
+        diastolic = stats['diastolic']
         
         print("📈 إحصائيات القياسات:")
-        print(f"   متوسط الانقباضي: {stats.avg_systolic:.1f} mmHg")
-        print(f"   متوسط الانبساطي: {stats.avg_diastolic:.1f} mmHg")
-        print(f"   نطاق الانقباضي: {stats.min_systolic:.1f} - {stats.max_systolic:.1f} mmHg")
-        print(f"   نطاق الانبساطي: {stats.min_diastolic:.1f} - {stats.max_diastolic:.1f} mmHg")
+        print(f"   متوسط الانقباضي: {systolic['avg']:.1f} mmHg")
+        print(f"   متوسط الانبساطي: {diastolic['avg']:.1f} mmHg")
+        print(f"   نطاق الانقباضي: {systolic['min']:.1f} - {systolic['max']:.1f} mmHg")
+        print(f"   نطاق الانبساطي: {diastolic['min']:.1f} - {diastolic['max']:.1f} mmHg")
         print()
         
         # حالة الجاهزية
-        minimum_required = 50
+        minimum_required = MINIMUM_REQUIRED
         if verified >= minimum_required:
             print(f"✅ جاهز للتدريب! ({verified} صورة)")
             print("💡 يمكنك الآن تشغيل:")
@@ -79,6 +84,44 @@ def check_training_data():
     finally:
         db.close()
 
+def update_verification(ids, is_verified):
+    """تغيير حالة التحقق مع تحديث العدادات في نفس المعاملة"""
+    ensure_training_data_stats()
+    db = SessionLocal()
+    try:
+        changed = set_verified(db, ids, is_verified)
+        db.commit()
+    finally:
+        db.close()
+    print(f"✅ تم تغيير حالة {changed} صف")
+
+def rebuild_stats():
+    db = SessionLocal()
+    try:
+        rebuild_training_data_stats(db)
+        db.commit()
+    finally:
+        db.close()
+    print("✅ تمت إعادة بناء العدادات من training_data")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="التحقق من بيانات التدريب")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--verify', type=int, nargs='+', metavar='ID',
+                       help="تعليم صفوف training_data كمحققة")
+    group.add_argument('--unverify', type=int, nargs='+', metavar='ID',
+                       help="إرجاع صفوف training_data إلى قيد الانتظار")
+    group.add_argument('--rebuild', action='store_true',
+                       help="إعادة بناء العدادات (بدون رفع بيانات أثناء التشغيل)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.verify:
+        update_verification(args.verify, 1)
+    elif args.unverify:
+        update_verification(args.unverify, 0)
+    elif args.rebuild:
+        rebuild_stats()
     check_training_data()
 
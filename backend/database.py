@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -14,10 +17,69 @@ DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 DB_NAME = os.getenv('DB_NAME', 'blood_pressure_db')
 DB_PORT = int(os.getenv('DB_PORT', 3308))
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Connection pool
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 10))
+
+# DATABASE_URL يمكن تجاوزه بالكامل (مثلاً sqlite:///./local.db للتطوير المحلي)
+DATABASE_URL = os.getenv(
+    'DATABASE_URL',
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+# المحرك غير المتزامن لنفس قاعدة البيانات
+ASYNC_DRIVERS = {
+    'mysql': 'aiomysql',
+    'sqlite': 'aiosqlite',
+}
+
+
+def to_async_url(url):
+    """mysql+pymysql://... -> mysql+aiomysql://... و sqlite://... -> sqlite+aiosqlite://..."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or to_async_url(DATABASE_URL)
+
+
+def engine_options(url):
+    """إعدادات الـ pool والمهلة حسب نوع قاعدة البيانات"""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        # SQLite: مهلة انتظار القفل بدلاً من مهلة الاتصال بالشبكة
+        options = {'connect_args': {'timeout': DB_CONNECT_TIMEOUT, 'check_same_thread': False}}
+        if url.database in (None, '', ':memory:'):
+            return options
+        if url.get_driver_name() == 'aiosqlite':
+            # aiosqlite يستخدم NullPool افتراضياً
+            options['poolclass'] = AsyncAdaptedQueuePool
+    else:
+        options = {'pool_pre_ping': True, 'connect_args': {'connect_timeout': DB_CONNECT_TIMEOUT}}
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+# متزامن: للسكريبتات و Alembic و init_db
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# غير متزامن: لمعالجات FastAPI
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 
@@ -41,6 +103,11 @@ class Measurement(Base):
     image_path = Column(String(255))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # يغطي ترتيب وتقسيم صفحات /api/history (keyset pagination)
+        Index('ix_measurements_user_created_id', 'user_id', 'created_at', 'id'),
+    )
+
 
 class TrainingData(Base):
     __tablename__ = "training_data"
@@ -54,6 +121,65 @@ class TrainingData(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class TrainingDataStats(Base):
+    """عدادات training_data محدثة مع كل إدراج/تحقق (انظر training_stats.py)"""
+    __tablename__ = "training_data_stats"
+
+    is_verified = Column(Integer, primary_key=True, autoincrement=False)  # صف لكل حالة
+    count = Column(Integer, nullable=False, default=0)
+    sum_systolic = Column(Float(precision=53), nullable=False, default=0)
+    sum_diastolic = Column(Float(precision=53), nullable=False, default=0)
+    min_systolic = Column(Float, nullable=True)
+    max_systolic = Column(Float, nullable=True)
+    min_diastolic = Column(Float, nullable=True)
+    max_diastolic = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TrainingImport(Base):
+    """تقدم استيراد أرشيف بيانات تدريب (انظر training_import.py)"""
+    __tablename__ = "training_imports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    archive_sha256 = Column(String(64), nullable=False)
+    archive_name = Column(String(255))
+    status = Column(String(20), nullable=False, default='running')  # running / completed / failed
+    rows_total = Column(Integer, nullable=False, default=0)
+    rows_done = Column(Integer, nullable=False, default=0)  # صفوف labels.csv المعالجة (مدرجة + مرفوضة)
+    rows_imported = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # نفس الأرشيف من نفس المستخدم = نفس الاستيراد (يُستأنف)
+        Index('ux_training_imports_user_archive', 'user_id', 'archive_sha256', unique=True),
+    )
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    key = Column(String(64), primary_key=True)  # sha256 hex للمحتوى (انظر storage.py)
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)  # عدد الصفوف التي تشير إليه
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)  # HMAC-SHA256
+    family_id = Column(String(32), nullable=False, index=True)  # سلسلة التدوير (لكشف إعادة الاستخدام)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
@@ -67,3 +193,23 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Get async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_status(engine_or_async_engine):
+    """حالة connection pool (QueuePool): الحجم والمستخدم والزائد"""
+    sync_engine = getattr(engine_or_async_engine, 'sync_engine', engine_or_async_engine)
+    pool = sync_engine.pool
+    status = {'pool_class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        status[name] = method() if callable(method) else None
+    status['max_overflow'] = getattr(pool, '_max_overflow', None)
+    status['timeout'] = pool.timeout() if hasattr(pool, 'timeout') else None
+    status['recycle'] = getattr(pool, '_recycle', None)
+    return status
+
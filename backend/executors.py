@@ -0,0 +1,114 @@
+"""
+Sized thread pools for blocking work (inference, CPU-bound helpers) so that
+async handlers never block the event loop. Database access goes through the
+async SQLAlchemy engine in database.py instead.
+
+bcrypt, OpenCV and TensorFlow all release the GIL while they work, so threads
+give real parallelism here without the pickling cost of a process pool.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INFERENCE_POOL_SIZE = int(os.getenv('INFERENCE_POOL_SIZE', 1))
+CPU_POOL_SIZE = int(os.getenv('CPU_POOL_SIZE', os.cpu_count() or 4))
+IMPORT_POOL_SIZE = int(os.getenv('IMPORT_POOL_SIZE', 1))
+
+
+class MonitoredThreadPool(Executor):
+    """ThreadPoolExecutor wrapper that tracks saturation (active/queued tasks)"""
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"{name}-pool"
+        )
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit a blocking call; returns a concurrent.futures.Future"""
+        enqueued = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+
+        def work():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                wait = started - enqueued
+                self._queue_wait_total += wait
+                self._queue_wait_max = max(self._queue_wait_max, wait)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+            return result
+
+        return self.executor.submit(work)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking call in this pool and await its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "completed": completed,
+                "failed": self._failed,
+                "saturation": round(self._active / self.max_workers, 3),
+                "queue_wait_ms": {
+                    "avg": round(self._queue_wait_total / completed * 1000, 3) if completed else 0.0,
+                    "max": round(self._queue_wait_max * 1000, 3),
+                },
+            }
+
+
+# Pools
+inference_pool = MonitoredThreadPool("inference", INFERENCE_POOL_SIZE)
+cpu_pool = MonitoredThreadPool("cpu", CPU_POOL_SIZE)
+# training-data archive imports (each runs its own image worker threads)
+import_pool = MonitoredThreadPool("import", IMPORT_POOL_SIZE)
+
+POOLS = (inference_pool, cpu_pool, import_pool)
+
+
+def pool_stats():
+    """Saturation stats for every pool, keyed by pool name"""
+    return {pool.name: pool.stats() for pool in POOLS}
+
+
+def shutdown_pools(wait=True):
+    for pool in POOLS:
+        pool.shutdown(wait=wait)
+
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+سكريبت لتصدير النموذج المدرب إلى TFLite (مع تكميم اختياري float16 / int8)
+
+Usage:
+    python export_model.py                    # بدون تكميم
+    python export_model.py --quantize float16
+    python export_model.py --quantize int8    # معايرة على data/train/images
+
+بعد التصدير شغّل الـ Backend مع:
+    BP_INFERENCE_BACKEND=tflite uvicorn main:app
+"""
+import sys
+import os
+import json
+import time
+import argparse
+
+# إضافة مسار backend إلى Python path
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from models.blood_pressure_model import BloodPressureCNN
+from models.packed_dataset import PackedDataset
+
+QUANTIZATION_MODES = ('none', 'float16', 'int8')
+
+
+def load_labeled_images(train_data_dir, limit=None):
+    """
+    تحميل الصور المعالجة والقيم الحقيقية من labels.csv
+    (من shards المضغوطة مسبقاً عبر memmap إذا كانت محدثة)
+    """
+    packed = PackedDataset.open_if_current(train_data_dir)
+    if packed is not None:
+        count = len(packed) if not limit else min(limit, len(packed))
+        images, labels = packed.take(np.arange(count))
+        return images.astype(np.float32) / 255.0, np.array(labels, dtype=np.float32)
+
+    labels_df = pd.read_csv(os.path.join(train_data_dir, 'labels.csv'))
+    if limit:
+        labels_df = labels_df.head(limit)
+
+    images_dir = os.path.join(train_data_dir, 'images')
+    preprocessor = BloodPressureCNN()
+    images, labels = [], []
+    for row in labels_df.itertuples():
+        image_path = os.path.join(images_dir, row.image_name)
+        try:
+            images.append(preprocessor.preprocess_image(image_path)[0])
+        except ValueError:
+            print(f"⚠️ تعذر قراءة الصورة: {image_path}")
+            continue
+        labels.append((row.systolic, row.diastolic))
+
+    if not images:
+        raise ValueError(f"❌ لا توجد صور صالحة في: {images_dir}")
+
+    return np.stack(images), np.array(labels, dtype=np.float32)
+
+
+def convert(keras_model, quantize='none', calibration_images=None):
+    """تحويل نموذج Keras إلى TFLite"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        if calibration_images is None or not len(calibration_images):
+            raise ValueError("❌ التكميم int8 يحتاج صور للمعايرة")
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis, ...]]
+
+        # أوزان وعمليات int8 مع إبقاء المدخلات والمخرجات float32
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    return converter.convert()
+
+
+def evaluate(model, images, labels, batch_size=32, latency_runs=20):
+    """حساب MAE وزمن الاستدلال لصورة واحدة"""
+    predictions = []
+    for start in range(0, len(images), batch_size):
+        for result in model.predict_batch(images[start:start + batch_size]):
+            predictions.append((result['systolic'], result['diastolic']))
+    errors = np.abs(np.array(predictions, dtype=np.float32) - labels)
+
+    # تسخين ثم قياس زمن صورة واحدة
+    single = images[:1]
+    model.predict_batch(single)
+    started = time.perf_counter()
+    for _ in range(latency_runs):
+        model.predict_batch(single)
+    latency_ms = (time.perf_counter() - started) / latency_runs * 1000
+
+    return {
+        'mae_systolic': round(float(errors[:, 0].mean()), 3),
+        'mae_diastolic': round(float(errors[:, 1].mean()), 3),
+        'latency_ms': round(latency_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="تصدير النموذج إلى TFLite")
+    parser.add_argument('--quantize', choices=QUANTIZATION_MODES, default='none')
+    parser.add_argument('--model-path', default=None, help="مسار ملف h5 (الافتراضي: models/blood_pressure_model.h5)")
+    parser.add_argument('--data-dir', default=os.path.join(backend_dir, 'data', 'train'))
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    parser.add_argument('--eval-samples', type=int, default=500)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"📦 تصدير النموذج إلى TFLite (التكميم: {args.quantize})")
+    print("=" * 60)
+
+    keras_cnn = BloodPressureCNN(model_path=args.model_path, inference_backend='keras')
+    if not os.path.exists(keras_cnn.model_path):
+        print(f"\n❌ النموذج المدرب غير موجود: {keras_cnn.model_path}")
+        print("💡 شغّل python train_model.py أولاً")
+        return 1
+    keras_model = keras_cnn.load_model()
+
+    images, labels = load_labeled_images(
+        args.data_dir, limit=max(args.eval_samples, args.calibration_samples)
+    )
+    print(f"✅ تم تحميل {len(images)} صورة من {args.data_dir}")
+
+    tflite_bytes = convert(
+        keras_model, args.quantize, calibration_images=images[:args.calibration_samples]
+    )
+    with open(keras_cnn.tflite_path, 'wb') as f:
+        f.write(tflite_bytes)
+    print(f"✅ تم حفظ النموذج: {keras_cnn.tflite_path}")
+
+    # مقارنة الدقة والزمن
+    eval_images, eval_labels = images[:args.eval_samples], labels[:args.eval_samples]
+    tflite_cnn = BloodPressureCNN(model_path=keras_cnn.model_path, inference_backend='tflite')
+    keras_metrics = evaluate(keras_cnn, eval_images, eval_labels)
+    tflite_metrics = evaluate(tflite_cnn, eval_images, eval_labels)
+
+    report = {
+        'quantize': args.quantize,
+        'eval_samples': len(eval_images),
+        'size_bytes': {
+            'keras': os.path.getsize(keras_cnn.model_path),
+            'tflite': len(tflite_bytes),
+        },
+        'keras': keras_metrics,
+        'tflite': tflite_metrics,
+        'delta': {
+            key: round(tflite_metrics[key] - keras_metrics[key], 3)
+            for key in keras_metrics
+        },
+    }
+    report_path = os.path.splitext(keras_cnn.tflite_path)[0] + '.export.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n📊 المقارنة (Keras → TFLite):")
+    print(f"   MAE الانقباضي: {keras_metrics['mae_systolic']} → {tflite_metrics['mae_systolic']}")
+    print(f"   MAE الانبساطي: {keras_metrics['mae_diastolic']} → {tflite_metrics['mae_diastolic']}")
+    print(f"   زمن صورة واحدة: {keras_metrics['latency_ms']} ms → {tflite_metrics['latency_ms']} ms")
+    print(f"   الحجم: {report['size_bytes']['keras'] / 1e6:.1f} MB → {report['size_bytes']['tflite'] / 1e6:.1f} MB")
+    print(f"\n📄 التقرير: {report_path}")
+    print("💡 للتفعيل: BP_INFERENCE_BACKEND=tflite")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
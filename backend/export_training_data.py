@@ -1,10 +1,25 @@
 #!/usr/bin/env python3
 """
 سكريبت لتصدير بيانات التدريب من قاعدة البيانات إلى CSV
+
+التصدير تزايدي: يحتفظ بملف manifest.json بمعرفات الصفوف المصدرة
+وحجم/توقيت/checksum كل صورة، فيتخطى الصور التي لم تتغير، ويستخدم
+hardlink أو reflink عندما يكون المصدر والوجهة على نفس نظام الملفات،
+وينسخ الباقي بالتوازي عبر مجمع خيوط.
+
+يُصدّر النسخة 224x224 PNG المحفوظة عند الرفع بدلاً من الأصل عندما تكون
+موجودة (training_XXXXX.png)، فيفك التدريب ترميز صور صغيرة. --originals
+يصدّر الصور الأصلية كاملة الحجم.
 """
 import sys
 import os
 import csv
+import json
+import errno
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # إضافة مسار backend إلى Python path
@@ -12,75 +27,248 @@ backend_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, backend_dir)
 
 from database import SessionLocal, TrainingData
-from sqlalchemy import func
+from storage import BlobStore, is_blob_key, training_image_name
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# ioctl(FICLONE) على Linux (btrfs / xfs / ...) لنسخ copy-on-write
+FICLONE = 0x40049409
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """sha256 لمحتوى الملف"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(source, dest):
+    import fcntl
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def link_or_copy(source, dest):
+    """
+    وضع نسخة من source في dest بأرخص طريقة متاحة:
+    hardlink ثم reflink ثم نسخ عادي. يُرجع الطريقة المستخدمة
+    """
+    tmp = dest.with_name(dest.name + '.tmp')
+    if tmp.exists():
+        tmp.unlink()
+
+    try:
+        os.link(source, tmp)
+        method = 'link'
+    except OSError:
+        try:
+            _reflink(source, tmp)
+            method = 'reflink'
+        except (OSError, ImportError):
+            shutil.copy2(source, tmp)
+            method = 'copy'
+
+    os.replace(tmp, dest)
+    return method
+
+
+def load_manifest(path):
+    if not path.exists():
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ تعذر قراءة {path}، سيتم التصدير الكامل")
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('entries', {})
+
+
+def write_atomic(path, write):
+    """كتابة ملف عبر ملف مؤقت ثم os.replace حتى لا يبقى ملف نصف مكتوب"""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def export_one(row, previous, images_dir, blob_store, originals=False):
+    """
+    تصدير صورة واحدة إن لزم
+    يُرجع (action, entry) حيث action: skipped / link / reflink / copy / missing
+    """
+    row_id, image_path, systolic, diastolic = row
+    source_path = blob_store.export_source(image_path, originals)
+    image_name = training_image_name(row_id, source_path)
+    dest_path = images_dir / image_name
+
+    if previous and previous.get('image_name') != image_name:
+        # تغيرت الصيغة (أصل <-> نسخة مصغرة): حذف الملف المصدر سابقاً
+        try:
+            (images_dir / previous['image_name']).unlink()
+        except FileNotFoundError:
+            pass
+
+    try:
+        stat = source_path.stat()
+    except FileNotFoundError:
+        return 'missing', None
+
+    entry = {
+        'image_name': image_name,
+        'source': str(source_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'systolic': systolic,
+        'diastolic': diastolic,
+    }
+
+    def checksum():
+        # ملفات الـ blob (والنسخة المصغرة المشتقة منها) لا تتغير، والمفتاح
+        # sha256 الأصل، فلا حاجة لقراءة الملف
+        return image_path if is_blob_key(image_path) else file_checksum(source_path)
+
+    dest_ok = dest_path.exists() and dest_path.stat().st_size == stat.st_size
+    if previous and dest_ok and previous.get('source') == entry['source']:
+        # نفس الملف بنفس الحجم والتوقيت: لا حاجة لقراءته
+        if previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+            entry['sha256'] = previous['sha256']
+            return 'skipped', entry
+        # التوقيت تغير فقط: المقارنة بالـ checksum
+        entry['sha256'] = checksum()
+        if entry['sha256'] == previous.get('sha256'):
+            return 'skipped', entry
+    else:
+        entry['sha256'] = checksum()
+
+    return link_or_copy(source_path, dest_path), entry
+
+
+def export_training_data(export_dir=None, workers=DEFAULT_WORKERS, full=False, originals=False):
+    """تصدير بيانات التدريب إلى CSV ومجلد الصور (تزايدياً)"""
+    export_dir = Path(export_dir or Path(backend_dir) / 'data' / 'train')
+    images_dir = export_dir / 'images'
+    images_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = export_dir / MANIFEST_NAME
+    csv_path = export_dir / 'labels.csv'
+
+    manifest = {} if full else load_manifest(manifest_path)
+    blob_store = BlobStore()
 
-def export_training_data():
-    """تصدير بيانات التدريب إلى CSV ومجلد الصور"""
     db = SessionLocal()
-    
     try:
-        # جلب جميع بيانات التدريب الم verified
-        training_data = db.query(TrainingData).filter(
+        # جلب جميع بيانات التدريب الم verified (الأعمدة المطلوبة فقط)
+        rows = db.query(
+            TrainingData.id,
+            TrainingData.image_path,
+            TrainingData.systolic,
+            TrainingData.diastolic,
+        ).filter(
             TrainingData.is_verified == 1
-        ).all()
-        
-        if not training_data:
-            print("❌ لا توجد بيانات تدريب للتصدير")
-            return
-        
-        print(f"📊 تم العثور على {len(training_data)} صورة للتدريب")
-        
-        # إنشاء مجلدات التصدير
-        export_dir = Path(backend_dir) / 'data' / 'train'
-        images_dir = export_dir / 'images'
-        images_dir.mkdir(parents=True, exist_ok=True)
-        
-        # إنشاء CSV
-        csv_path = export_dir / 'labels.csv'
-        
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['image_name', 'systolic', 'diastolic'])
-            
-            for idx, data in enumerate(training_data, 1):
-                # نسخ الصورة
-                source_path = Path(data.image_path)
-                if source_path.exists():
-                    # اسم جديد للصورة
-                    image_name = f"training_{data.id:05d}.jpg"
-                    dest_path = images_dir / image_name
-                    
-                    # نسخ الصورة
-                    import shutil
-                    shutil.copy2(source_path, dest_path)
-                    
-                    # كتابة في CSV
-                    writer.writerow([
-                        image_name,
-                        data.systolic,
-                        data.diastolic
-                    ])
-                    
-                    if idx % 10 == 0:
-                        print(f"✅ تم تصدير {idx}/{len(training_data)} صورة")
-                else:
-                    print(f"⚠️ الصورة غير موجودة: {source_path}")
-        
-        print(f"\n✅ تم التصدير بنجاح!")
-        print(f"📁 الصور: {images_dir}")
-        print(f"📄 CSV: {csv_path}")
-        print(f"\n💡 الآن يمكنك تشغيل: python train_model.py")
-        
-    except Exception as e:
-        print(f"❌ خطأ في التصدير: {e}")
-        import traceback
-        traceback.print_exc()
+        ).order_by(TrainingData.id).all()
     finally:
         db.close()
 
+    if not rows:
+        print("❌ لا توجد بيانات تدريب للتصدير")
+        return
+
+    print(f"📊 تم العثور على {len(rows)} صورة للتدريب ({len(manifest)} في manifest)")
+
+    counts = {'skipped': 0, 'link': 0, 'reflink': 0, 'copy': 0, 'missing': 0, 'failed': 0}
+    entries = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(export_one, tuple(row), manifest.get(str(row.id)), images_dir, blob_store, originals): row
+            for row in rows
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            row = futures[future]
+            try:
+                action, entry = future.result()
+            except OSError as e:
+                print(f"⚠️ فشل تصدير الصورة {row.image_path}: {e}")
+                counts['failed'] += 1
+                continue
+
+            counts[action] += 1
+            if action == 'missing':
+                print(f"⚠️ الصورة غير موجودة: {row.image_path}")
+            else:
+                entries[str(row.id)] = entry
+
+            if done % 1000 == 0:
+                print(f"✅ تمت معالجة {done}/{len(rows)} صورة")
+
+    # حذف الصور المصدرة سابقاً لصفوف لم تعد موجودة / موثقة
+    removed = 0
+    for row_id, entry in manifest.items():
+        if row_id not in entries:
+            try:
+                (images_dir / entry['image_name']).unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    print(f"⚠️ تعذر حذف {entry['image_name']}: {e}")
+
+    ordered = sorted(entries.items(), key=lambda item: int(item[0]))
+
+    def write_labels(f):
+        writer = csv.writer(f)
+        writer.writerow(['image_name', 'systolic', 'diastolic'])
+        for _, entry in ordered:
+            writer.writerow([entry['image_name'], entry['systolic'], entry['diastolic']])
+
+    def write_manifest(f):
+        json.dump({'version': MANIFEST_VERSION, 'entries': dict(ordered)}, f)
+
+    # labels.csv أولاً ثم manifest: إذا انقطع التشغيل بينهما يعيد التشغيل التالي التحقق فقط
+    write_atomic(csv_path, write_labels)
+    write_atomic(manifest_path, write_manifest)
+
+    exported = counts['link'] + counts['reflink'] + counts['copy']
+    print("\n✅ تم التصدير بنجاح!")
+    print(
+        f"📦 جديد/متغير: {exported} (hardlink: {counts['link']}, reflink: {counts['reflink']}, "
+        f"نسخ: {counts['copy']}) | بدون تغيير: {counts['skipped']} | "
+        f"مفقود: {counts['missing']} | فشل: {counts['failed']} | محذوف: {removed}"
+    )
+    print(f"📁 الصور: {images_dir}")
+    print(f"📄 CSV: {csv_path}")
+    print("\n💡 الآن يمكنك تشغيل: python train_model.py")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="تصدير بيانات التدريب من قاعدة البيانات")
+    parser.add_argument('--output-dir', default=None,
+                        help="مجلد التصدير (الافتراضي: data/train)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="عدد خيوط النسخ المتوازي")
+    parser.add_argument('--full', action='store_true',
+                        help="تجاهل manifest وإعادة تصدير كل الصور")
+    parser.add_argument('--originals', action='store_true',
+                        help="تصدير الصور الأصلية كاملة الحجم بدلاً من النسخ 224x224")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     print("=" * 60)
     print("📤 تصدير بيانات التدريب")
     print("=" * 60)
-    export_training_data()
-
+    try:
+        export_training_data(args.output_dir, workers=args.workers, full=args.full, originals=args.originals)
+    except Exception as e:
+        print(f"❌ خطأ في التصدير: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
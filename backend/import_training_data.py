@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+سكريبت لاستيراد بيانات تدريب من أرشيف zip / tar (مثلاً من جهة شريكة)
+
+الأرشيف بنفس تخطيط التصدير: labels.csv (image_name, systolic, diastolic)
+والصور في images/ أو بجانب labels.csv. الصفوف غير الصالحة تُرفض وتُعرض
+أسبابها، والصور تُحفظ بالتوازي في مخزن الصور، والصفوف تُدرج على دفعات
+(انظر training_import.py). إذا انقطع الاستيراد أعد تشغيل نفس الأمر
+ليُستأنف من آخر دفعة محفوظة.
+"""
+import sys
+import os
+import argparse
+
+# إضافة مسار backend إلى Python path
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from database import init_db
+from training_import import IMPORT_CHUNK_ROWS, IMPORT_WORKERS, ArchiveImport, ImportArchiveError
+from training_stats import ensure_training_data_stats
+
+
+def import_training_data(archive_path, user_id, verified=True, workers=IMPORT_WORKERS, chunk_rows=IMPORT_CHUNK_ROWS):
+    init_db()
+    ensure_training_data_stats()
+
+    try:
+        importer = ArchiveImport(archive_path, user_id, verified=verified)
+    except ImportArchiveError as e:
+        print(f"❌ {e}")
+        return False
+
+    try:
+        report = importer.start()
+        print(f"📊 {report['rows_total']} صف في labels.csv")
+        if report['status'] == 'completed':
+            print(f"✅ تم استيراد هذا الأرشيف سابقاً (استيراد #{report['import_id']})")
+            return True
+        if report['rows_done']:
+            print(f"🔄 استئناف الاستيراد #{report['import_id']} من الصف {report['rows_done']}")
+
+        # تحميل النموذج لفك ترميز الصور بنفس خطوات الخادم
+        from models.blood_pressure_model import BloodPressureCNN
+        load_pixels = BloodPressureCNN().load_pixels
+
+        def progress(report):
+            print(
+                f"✅ {report['rows_done']}/{report['rows_total']} "
+                f"(مستورد: {report['rows_imported']}, مرفوض: {report['rows_rejected']})"
+            )
+
+        report = importer.run(load_pixels, workers=workers, chunk_rows=chunk_rows, progress=progress)
+    finally:
+        importer.close()
+
+    for error in report['errors']:
+        print(f"⚠️ السطر {error['line']} ({error['image_name']}): {error['error']}")
+    if report['rows_rejected'] > len(report['errors']):
+        print(f"⚠️ ... و {report['rows_rejected'] - len(report['errors'])} صف مرفوض آخر")
+
+    status = "موثقة" if verified else "قيد الانتظار"
+    print("\n✅ تم الاستيراد بنجاح!")
+    print(f"📦 مستورد: {report['rows_imported']} ({status}) | مرفوض: {report['rows_rejected']}")
+    return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="استيراد بيانات تدريب من أرشيف zip / tar")
+    parser.add_argument('archive', help="مسار الأرشيف (.zip أو .tar / .tar.gz)")
+    parser.add_argument('--user-id', type=int, required=True,
+                        help="المستخدم الذي تُنسب إليه البيانات المستوردة")
+    parser.add_argument('--pending', action='store_true',
+                        help="استيراد الصفوف قيد الانتظار بدلاً من موثقة")
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS,
+                        help="عدد خيوط فك ترميز وحفظ الصور")
+    parser.add_argument('--chunk-rows', type=int, default=IMPORT_CHUNK_ROWS,
+                        help="عدد الصفوف في كل دفعة إدراج (معاملة واحدة)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("=" * 60)
+    print("📥 استيراد بيانات التدريب")
+    print("=" * 60)
+    try:
+        ok = import_training_data(
+            args.archive, args.user_id, verified=not args.pending,
+            workers=args.workers, chunk_rows=args.chunk_rows,
+        )
+    except Exception as e:
+        print(f"❌ خطأ في الاستيراد: {e}")
+        print("💡 أعد تشغيل نفس الأمر لاستئناف الاستيراد")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    if not ok:
+        sys.exit(1)
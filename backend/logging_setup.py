@@ -0,0 +1,110 @@
+"""
+Non-blocking structured logging.
+
+Log records are put on an in-memory queue by a QueueHandler and formatted and
+written as JSON lines by a QueueListener thread, so request handlers never
+wait on stream or disk I/O. RequestLogMiddleware emits one line per request.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# نسبة طلبات 2xx/3xx التي يتم تسجيلها (الأخطاء تُسجل دائماً)
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object per line, including `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, stream=None):
+    """Route all logging through a queue drained by a background thread"""
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class RequestLogMiddleware:
+    """
+    ASGI middleware that logs one structured line per request: method, path,
+    status, duration and user id (set by get_current_user on request.state).
+    Successful responses are sampled at `sample_rate`; errors are always logged.
+    """
+
+    def __init__(self, app, sample_rate=LOG_SAMPLE_RATE, logger_name='access'):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if status_code >= 400 or random.random() < self.sample_rate:
+                self.logger.log(
+                    logging.ERROR if status_code >= 500 else logging.INFO,
+                    'request',
+                    extra={
+                        'method': scope['method'],
+                        'path': scope['path'],
+                        'status': status_code,
+                        'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+                        'user_id': scope.get('state', {}).get('user_id'),
+                    },
+                )
@@ -1,25 +1,44 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form, WebSocket, WebSocketDisconnect, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import and_, exists, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel, EmailStr
 from jose import JWTError, jwt
 import bcrypt
 from datetime import datetime, timedelta
+from typing import List, Optional
 import os
-import shutil
+import io
+import asyncio
+import csv
+import zlib
+import hmac
+import hashlib
+import secrets
 import logging
-from pathlib import Path
+from collections import deque
 
-# إعداد logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+import numpy as np
+
+from logging_setup import configure_logging, RequestLogMiddleware
+
+# إعداد logging (JSON غير متزامن عبر queue)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-from database import get_db, init_db, User, Measurement, TrainingData
+from database import async_engine, AsyncSessionLocal, init_db, pool_status, User, Measurement, TrainingData, TrainingDataStats, TrainingImport, RefreshToken
+from executors import inference_pool, cpu_pool, import_pool, pool_stats, shutdown_pools
+from storage import BlobStore, add_blob_refs_statement, blob_key, blob_ref_rows, training_image_name
+from training_stats import MINIMUM_REQUIRED, ensure_training_data_stats, record_training_data, summarize
+from training_import import ArchiveImport, ImportArchiveError, ImportArchiveTooLarge, import_report, spool_archive
+from caching import TTLCache, SingleFlight
+from user_cache import UserPrincipal, user_cache
+import metrics
+from metrics import MetricsMiddleware, observe_stage
 from models.blood_pressure_model import BloodPressureCNN
+from models.inference_batcher import InferenceBatcher
 from models.health_recommendations import HealthRecommendationsAI
 
 # Initialize FastAPI
@@ -38,31 +57,121 @@ app.add_middleware(
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+
+# Inference batching
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 16))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 5))
+
+# Multi-image measurement (/api/measure/batch)
+MEASURE_BATCH_MAX_IMAGES = int(os.getenv("MEASURE_BATCH_MAX_IMAGES", 16))
+
+# Streaming measurement (/ws/measure)
+MEASURE_STREAM_MAX_FPS = float(os.getenv("MEASURE_STREAM_MAX_FPS", 10))
+MEASURE_STREAM_BATCH_SIZE = int(os.getenv("MEASURE_STREAM_BATCH_SIZE", 8))
+MEASURE_STREAM_WINDOW = int(os.getenv("MEASURE_STREAM_WINDOW", 30))
+MEASURE_STREAM_MAX_FRAME_BYTES = int(os.getenv("MEASURE_STREAM_MAX_FRAME_BYTES", 2 * 1024 * 1024))
+MEASURE_STREAM_AUTH_TIMEOUT = float(os.getenv("MEASURE_STREAM_AUTH_TIMEOUT", 10))
+
+# History pagination
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+# Prediction cache (keyed by image content hash + model version)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 1024))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", 3600))
 
 # Password hashing using bcrypt directly
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
-# Middleware للـ logging
-@app.middleware("http")
-async def log_requests(request, call_next):
-    logger.info(f"{request.method} {request.url.path}")
-    if request.headers.get("authorization"):
-        auth_header = request.headers.get("authorization")
-        logger.info(f"Authorization header present: {auth_header[:30]}...")
-    response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
-    return response
+# Middleware للـ logging (سطر JSON واحد لكل طلب)
+app.add_middleware(RequestLogMiddleware)
+# Middleware للمقاييس (/metrics)
+app.add_middleware(MetricsMiddleware)
 
 # Initialize models
 bp_model = BloodPressureCNN()
 recommendations_ai = HealthRecommendationsAI()
+inference_batcher = InferenceBatcher(
+    bp_model,
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+    executor=inference_pool,
+    on_batch=lambda size, waits, predict_seconds: record_inference_batch(size, waits, predict_seconds),
+)
+prediction_cache = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL_SECONDS)
+prediction_flights = SingleFlight()
 
-# Create uploads directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+def record_inference_batch(batch_size, queue_waits, predict_seconds):
+    """مقاييس كل دفعة استدلال (من InferenceBatcher)"""
+    metrics.inference_batch_size.observe(batch_size)
+    queue_wait = metrics.stage_duration_seconds.labels("queue_wait")
+    for wait in queue_waits:
+        queue_wait.observe(wait)
+    metrics.stage_duration_seconds.labels("predict").observe(predict_seconds)
+
+
+@metrics.registry.collector
+def collect_runtime_metrics():
+    """قيم يملكها مكونات أخرى تُقرأ عند كل scrape"""
+    yield (
+        "bp_model_load_seconds", "gauge", "Time taken to load the CNN model",
+        [({"backend": bp_model.inference_backend}, bp_model.load_seconds)],
+    )
+    
+    batcher = inference_batcher.stats()
+    yield (
+        "bp_inference_queue_depth", "gauge", "Images waiting for the next inference batch",
+        [({}, batcher["queue_depth"])],
+    )
+    yield (
+        "bp_inference_in_flight", "gauge", "Distinct predictions currently in flight",
+        [({}, prediction_flights.stats()["in_flight"])],
+    )
+    
+    pools = pool_stats()
+    yield ("bp_pool_workers", "gauge", "Thread pool size",
+           [({"pool": name}, p["max_workers"]) for name, p in pools.items()])
+    yield ("bp_pool_active", "gauge", "Thread pool tasks running",
+           [({"pool": name}, p["active"]) for name, p in pools.items()])
+    yield ("bp_pool_queued", "gauge", "Thread pool tasks waiting for a worker",
+           [({"pool": name}, p["queued"]) for name, p in pools.items()])
+    yield ("bp_pool_completed_total", "counter", "Thread pool tasks completed",
+           [({"pool": name}, p["completed"]) for name, p in pools.items()])
+    
+    caches = {"predictions": prediction_cache.stats(), "users": user_cache.stats()}
+    for field in ("hits", "misses", "evictions"):
+        yield (f"bp_cache_{field}_total", "counter", f"Cache {field}",
+               [({"cache": name}, c[field]) for name, c in caches.items()])
+    yield ("bp_cache_size", "gauge", "Cache entries",
+           [({"cache": name}, c["size"]) for name, c in caches.items()])
+    
+    # SQLAlchemy connection pool (async engine)
+    db = pool_status(async_engine)
+    yield ("bp_db_pool_size", "gauge", "DB connection pool size", [({}, db["size"])])
+    yield ("bp_db_pool_checked_out", "gauge", "DB connections in use", [({}, db["checkedout"])])
+    yield ("bp_db_pool_overflow", "gauge", "DB connections opened beyond pool size", [({}, db["overflow"])])
+
+
+# تخزين الصور حسب المحتوى (uploads/ab/cd/<sha256>)
+blob_store = BlobStore()
+add_blob_refs = add_blob_refs_statement(async_engine.dialect.name)
 
 # Initialize database
 init_db()
+ensure_training_data_stats()
+
+
+@app.on_event("startup")
+async def start_inference_batcher():
+    await inference_batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_inference_batcher():
+    await inference_batcher.stop()
+    shutdown_pools(wait=False)
+    await async_engine.dispose()
 
 
 # Pydantic models
@@ -84,6 +193,11 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class MeasurementResponse(BaseModel):
@@ -114,6 +228,36 @@ def get_password_hash(password):
     ).decode('utf-8')
 
 
+async def persist_upload(key, data, pixels):
+    """
+    حفظ الصورة في الخلفية بعد إرسال الاستجابة (خارج مسار الاستدلال):
+    النسخة 224x224 من البكسلات المفكوكة مسبقاً، والأصل إذا كانت الأرشفة مفعلة
+    """
+    try:
+        await cpu_pool.run(blob_store.put_upload, data, pixels, key)
+    except OSError as e:
+        logger.error(f"Failed to persist upload {key}: {e}")
+
+
+async def predict_cached(processed_img):
+    """
+    التنبؤ مع كاش حسب محتوى الصورة
+    الطلبات المتزامنة لنفس الصورة تشترك في استدلال واحد
+    """
+    with observe_stage("cache_lookup"):
+        key = await cpu_pool.run(bp_model.cache_key, processed_img)
+        result = prediction_cache.get(key)
+    if result is not None:
+        return result
+
+    async def compute():
+        result = await inference_batcher.submit(processed_img)
+        prediction_cache.set(key, result)
+        return result
+
+    return await prediction_flights.do(key, compute)
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     # تحويل sub إلى string إذا كان integer (JWT يتطلب string)
@@ -128,146 +272,292 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-):
-    import logging
-    logger = logging.getLogger(__name__)
+def hash_refresh_token(token):
+    """
+    HMAC-SHA256 للـ refresh token - نخزن الـ hash فقط في قاعدة البيانات
+    (تكلفة HMAC واحد بدلاً من جولة bcrypt)
+    """
+    return hmac.new(
+        SECRET_KEY.encode('utf-8'), token.encode('utf-8'), hashlib.sha256
+    ).hexdigest()
+
+
+def create_refresh_token(db, user_id, family_id=None):
+    """إنشاء refresh token جديد (يُحفظ مع commit الجلسة)"""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+async def issue_refresh_token(db, user_id):
+    token = create_refresh_token(db, user_id)
+    await db.commit()
+    return token
+
+
+async def revoke_refresh_family(db, family_id, now=None):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now or datetime.utcnow())
+    )
+
+
+async def rotate_refresh_token(db, token):
+    """
+    تدوير refresh token: إبطال القديم وإصدار جديد في نفس السلسلة
+    يُرجع (user_id, new_token) أو None إذا كان الـ token غير صالح
+    إعادة استخدام token تم تدويره تُبطل السلسلة بالكامل
+    """
+    now = datetime.utcnow()
+    row = (await db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token))
+    )).scalar_one_or_none()
+    if row is None:
+        return None
+    
+    if row.revoked_at is not None:
+        logger.warning(f"Refresh token reuse detected for user {row.user_id}")
+        await revoke_refresh_family(db, row.family_id, now)
+        await db.commit()
+        return None
+    
+    if row.expires_at <= now:
+        return None
+    
+    # إبطال شرطي حتى لا ينجح تدويران متزامنان لنفس الـ token
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == row.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if claimed.rowcount != 1:
+        await db.rollback()
+        return None
+    
+    new_token = create_refresh_token(db, row.user_id, row.family_id)
+    await db.commit()
+    return row.user_id, new_token
+
+
+def build_token_response(user, refresh_token=None):
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.id}, expires_delta=access_token_expires
+    )
+    
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": UserResponse.model_validate(user),
+        "refresh_token": refresh_token,
+    }
+
+
+async def load_user_principal(user_id):
+    """المستخدم من الكاش، أو من قاعدة البيانات عند عدم وجوده (None إن لم يوجد)"""
+    principal = user_cache.get(user_id)
+    if principal is not None:
+        return principal
     
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+    if user is None:
+        return None
+    
+    principal = UserPrincipal.from_user(user)
+    user_cache.set(user_id, principal)
+    return principal
+
+
+async def authenticate_token(token: str) -> UserPrincipal:
+    """التحقق من access token وإرجاع المستخدم (HTTPException 401 عند الفشل)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="غير مصرح لك - يرجى تسجيل الدخول",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Logging للـ token المستلم
-    logger.info(f"Received token (first 20 chars): {token[:20] if token else 'None'}...")
-    logger.info(f"Token length: {len(token) if token else 0}")
-    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         # sub هو string في JWT، نحتاج لتحويله إلى int
         sub_value = payload.get("sub")
-        logger.info(f"Decoded token successfully. Sub value: {sub_value} (type: {type(sub_value).__name__})")
         
         if sub_value is None:
-            logger.error("Sub is None in token payload")
+            logger.warning("Sub is None in token payload")
             raise credentials_exception
         
         # تحويل sub من string إلى int
         try:
             user_id: int = int(sub_value)
         except (ValueError, TypeError):
-            logger.error(f"Cannot convert sub to int: {sub_value}")
+            logger.warning(f"Cannot convert sub to int: {sub_value}")
             raise credentials_exception
     except JWTError as e:
-        # تحسين رسالة الخطأ مع logging
-        logger.error(f"JWT Error: {str(e)}")
-        logger.error(f"Token that failed: {token[:50] if token else 'None'}...")
+        # لا نسجل محتوى الـ token
+        logger.warning(f"JWT Error: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"الـ token غير صحيح أو منتهي الصلاحية: {str(e)}",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        logger.error(f"User with ID {user_id} not found in database")
+    # كاش المستخدمين يوفر استعلام قاعدة البيانات في كل طلب
+    principal = await load_user_principal(user_id)
+    if principal is None:
+        logger.warning(f"User with ID {user_id} not found in database")
         raise credentials_exception
-    
-    logger.info(f"User authenticated successfully: {user.email}")
-    return user
+    return principal
+
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    principal = await authenticate_token(token)
+    # يظهر في سطر الـ log الخاص بالطلب
+    request.state.user_id = principal.id
+    return principal
 
 
 # Routes
 @app.post("/api/auth/register", response_model=Token)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate):
+    email_taken = HTTPException(status_code=400, detail="البريد الإلكتروني مستخدم بالفعل")
+    
     # Check if user exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    async with AsyncSessionLocal() as db:
+        existing_user = (await db.execute(
+            select(User.id).where(User.email == user_data.email)
+        )).first()
     if existing_user:
-        raise HTTPException(status_code=400, detail="البريد الإلكتروني مستخدم بالفعل")
+        raise email_taken
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        name=user_data.name,
-        email=user_data.email,
-        password_hash=hashed_password,
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    hashed_password = await cpu_pool.run(get_password_hash, user_data.password)
     
-    # Create token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": db_user.id}, expires_delta=access_token_expires
-    )
+    async with AsyncSessionLocal() as db:
+        db_user = User(
+            name=user_data.name,
+            email=user_data.email,
+            password_hash=hashed_password,
+        )
+        db.add(db_user)
+        try:
+            await db.flush()
+            refresh_token = create_refresh_token(db, db_user.id)
+            await db.commit()
+        except IntegrityError:
+            # تسجيل متزامن بنفس البريد
+            await db.rollback()
+            raise email_taken
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": UserResponse.model_validate(db_user),
-    }
+    # Create token
+    return build_token_response(db_user, refresh_token)
 
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
-):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(
+            select(User).where(User.email == form_data.username)
+        )).scalar_one_or_none()
+    if not user or not await cpu_pool.run(
+        verify_password, form_data.password, user.password_hash
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="البريد الإلكتروني أو كلمة المرور غير صحيحة",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.id}, expires_delta=access_token_expires
+    async with AsyncSessionLocal() as db:
+        refresh_token = await issue_refresh_token(db, user.id)
+    return build_token_response(user, refresh_token)
+
+
+@app.post("/api/auth/refresh", response_model=Token)
+async def refresh(request: RefreshRequest):
+    """
+    تجديد الـ access token باستخدام refresh token (بدون bcrypt)
+    يتم تدوير الـ refresh token في كل استخدام
+    """
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="الـ refresh token غير صحيح أو منتهي الصلاحية - يرجى تسجيل الدخول",
+        headers={"WWW-Authenticate": "Bearer"},
     )
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": UserResponse.model_validate(user),
-    }
+    async with AsyncSessionLocal() as db:
+        rotated = await rotate_refresh_token(db, request.refresh_token)
+    if rotated is None:
+        raise invalid_token
+    user_id, refresh_token = rotated
+    
+    principal = await load_user_principal(user_id)
+    if principal is None:
+        raise invalid_token
+    
+    return build_token_response(principal, refresh_token)
+
+
+@app.post("/api/auth/logout")
+async def logout(request: RefreshRequest):
+    """إبطال الـ refresh token (وكل السلسلة الناتجة عن تدويره)"""
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(RefreshToken.family_id)
+            .where(RefreshToken.token_hash == hash_refresh_token(request.refresh_token))
+        )).first()
+        if row is not None:
+            await revoke_refresh_family(db, row.family_id)
+            await db.commit()
+    return {"message": "تم تسجيل الخروج"}
 
 
 @app.post("/api/measure")
 async def measure_blood_pressure(
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"Measure request received from user: {current_user.email} (ID: {current_user.id})")
-    # Save uploaded image
-    file_path = UPLOAD_DIR / f"{current_user.id}_{datetime.now().timestamp()}.jpg"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    # Read uploaded image into memory (decoded without touching disk)
+    with observe_stage("upload_read"):
+        image_bytes = await image.read()
     
     try:
-        # Predict blood pressure using CNN
-        result = bp_model.predict(str(file_path))
+        image_key = await cpu_pool.run(blob_key, image_bytes)
+        
+        # Predict blood pressure using CNN (batched with concurrent requests)
+        with observe_stage("preprocess"):
+            pixels = await cpu_pool.run(bp_model.load_pixels, image_bytes)
+            processed_img = bp_model.normalize_pixels(pixels)
+        with observe_stage("inference"):
+            result = await predict_cached(processed_img)
         
         # Get health recommendations
-        recommendations_data = recommendations_ai.get_recommendations(
-            result['systolic'], result['diastolic']
-        )
+        with observe_stage("recommendations"):
+            recommendations_data = recommendations_ai.get_recommendations(
+                result['systolic'], result['diastolic']
+            )
         
         # Save measurement to database
-        measurement = Measurement(
-            user_id=current_user.id,
-            systolic=result['systolic'],
-            diastolic=result['diastolic'],
-            image_path=str(file_path),
-        )
-        db.add(measurement)
-        db.commit()
-        db.refresh(measurement)
+        with observe_stage("db_commit"):
+            async with AsyncSessionLocal() as db:
+                measurement = Measurement(
+                    user_id=current_user.id,
+                    systolic=result['systolic'],
+                    diastolic=result['diastolic'],
+                    image_path=image_key,
+                )
+                db.add(measurement)
+                await db.execute(add_blob_refs, blob_ref_rows([(image_key, len(image_bytes))]))
+                await db.commit()
+        
+        # Persist the image after the response is sent
+        background_tasks.add_task(persist_upload, image_key, image_bytes, pixels)
         
         return {
             "id": measurement.id,
@@ -279,30 +569,394 @@ async def measure_blood_pressure(
             "severity": recommendations_data['severity'],
         }
     except Exception as e:
-        # Clean up file on error
-        if file_path.exists():
-            file_path.unlink()
         raise HTTPException(status_code=500, detail=f"خطأ في معالجة الصورة: {str(e)}")
 
 
+@app.post("/api/measure/batch")
+async def measure_blood_pressure_batch(
+    background_tasks: BackgroundTasks,
+    images: List[UploadFile] = File(...),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """
+    قياس ضغط الدم من عدة صور في طلب واحد (جلسة كشك مثلاً)
+    الصور تُعالج معاً وتمر على النموذج في تمريرة واحدة، وتُحفظ كل القياسات
+    في insert واحد، مع نتيجة لكل صورة ومتوسط للجلسة
+    """
+    if len(images) > MEASURE_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"الحد الأقصى {MEASURE_BATCH_MAX_IMAGES} صورة في الطلب الواحد"
+        )
+    
+    with observe_stage("upload_read"):
+        images_bytes = [await image.read() for image in images]
+    
+    with observe_stage("preprocess"):
+        try:
+            pixels_batch = await asyncio.gather(*(
+                cpu_pool.run(bp_model.load_pixels, image_bytes)
+                for image_bytes in images_bytes
+            ))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="تعذر قراءة إحدى الصور"
+            )
+        processed = [bp_model.normalize_pixels(pixels) for pixels in pixels_batch]
+    
+    try:
+        # الصور الموجودة في الكاش لا تحتاج استدلالاً؛ الباقي في تمريرة واحدة
+        with observe_stage("cache_lookup"):
+            keys = await asyncio.gather(*(
+                cpu_pool.run(bp_model.cache_key, processed_img) for processed_img in processed
+            ))
+            results = [prediction_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            with observe_stage("inference"):
+                stacked = np.concatenate([processed[i] for i in missing], axis=0)
+                predictions = await inference_pool.run(bp_model.predict_batch, stacked)
+            metrics.inference_batch_size.observe(len(missing))
+            for i, prediction in zip(missing, predictions):
+                results[i] = prediction
+                prediction_cache.set(keys[i], prediction)
+        
+        with observe_stage("recommendations"):
+            systolic = [result['systolic'] for result in results]
+            diastolic = [result['diastolic'] for result in results]
+            recommendations_batch = recommendations_ai.get_recommendations_batch(systolic, diastolic)
+            mean_systolic = round(float(np.mean(systolic)), 1)
+            mean_diastolic = round(float(np.mean(diastolic)), 1)
+            session_recommendations = recommendations_ai.get_recommendations(mean_systolic, mean_diastolic)
+        
+        created_at = datetime.utcnow()
+        image_keys = await asyncio.gather(*(
+            cpu_pool.run(blob_key, image_bytes) for image_bytes in images_bytes
+        ))
+        rows = [
+            {
+                "user_id": current_user.id,
+                "systolic": result['systolic'],
+                "diastolic": result['diastolic'],
+                "image_path": image_key,
+                "created_at": created_at,
+            }
+            for result, image_key in zip(results, image_keys)
+        ]
+        
+        # insert واحد لكل الصفوف (executemany)
+        with observe_stage("db_commit"):
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(Measurement), rows)
+                await db.execute(add_blob_refs, blob_ref_rows(
+                    (image_key, len(image_bytes)) for image_key, image_bytes in zip(image_keys, images_bytes)
+                ))
+                await db.commit()
+        
+        # الصور المكررة في نفس الطلب تُكتب مرة واحدة
+        uploads = {
+            image_key: (image_bytes, pixels)
+            for image_key, image_bytes, pixels in zip(image_keys, images_bytes, pixels_batch)
+        }
+        for image_key, (image_bytes, pixels) in uploads.items():
+            background_tasks.add_task(persist_upload, image_key, image_bytes, pixels)
+        
+        return {
+            "count": len(results),
+            "created_at": created_at.isoformat(),
+            "results": [
+                {
+                    "filename": image.filename,
+                    "systolic": result['systolic'],
+                    "diastolic": result['diastolic'],
+                    "recommendations": recommendations_data['recommendations'],
+                    "category": recommendations_data['category'],
+                    "severity": recommendations_data['severity'],
+                }
+                for image, result, recommendations_data in zip(images, results, recommendations_batch)
+            ],
+            "aggregate": {
+                "systolic": mean_systolic,
+                "diastolic": mean_diastolic,
+                "systolic_range": [min(systolic), max(systolic)],
+                "diastolic_range": [min(diastolic), max(diastolic)],
+                "recommendations": session_recommendations['recommendations'],
+                "category": session_recommendations['category'],
+                "severity": session_recommendations['severity'],
+            },
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"خطأ في معالجة الصور: {str(e)}")
+
+
+class FrameStream:
+    """
+    حالة جلسة قياس متدفقة واحدة (WebSocket)
+
+    الإطارات الواردة أسرع من max_fps تُتجاهل، ولا يُحتفظ إلا بآخر batch_size
+    إطار بانتظار المعالجة (الأقدم يُسقط تحت الضغط)، والتقدير الجاري هو
+    الوسيط لآخر window قراءة - فالذاكرة لكل اتصال محدودة.
+    """
+
+    def __init__(self, max_fps, batch_size, window):
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.pending = deque(maxlen=max(1, batch_size))
+        self.readings = deque(maxlen=max(1, window))
+        self.ready = asyncio.Event()
+        self.closed = False
+        self._last_accepted = float("-inf")
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def offer(self, frame, now):
+        """إضافة إطار جديد أو تجاهله حسب حد معدل الإطارات"""
+        self.received += 1
+        if now - self._last_accepted < self.min_interval:
+            self.dropped += 1
+            return
+        self._last_accepted = now
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(frame)
+        self.ready.set()
+
+    def take(self):
+        frames = list(self.pending)
+        self.pending.clear()
+        self.ready.clear()
+        return frames
+
+    def estimate(self):
+        if not self.readings:
+            return None
+        readings = np.array(self.readings, dtype=np.float64)
+        systolic, diastolic = np.median(readings, axis=0)
+        return {"systolic": round(float(systolic), 1), "diastolic": round(float(diastolic), 1)}
+
+    def snapshot(self, latest=None):
+        return {
+            "type": "estimate",
+            "estimate": self.estimate(),
+            "latest": latest or [],
+            "frames_received": self.received,
+            "frames_processed": self.processed,
+            "frames_dropped": self.dropped,
+        }
+
+
+async def preprocess_frame(frame):
+    try:
+        return await cpu_pool.run(bp_model.preprocess_image, frame)
+    except ValueError:
+        return None
+
+
+async def authenticate_websocket(websocket: WebSocket):
+    """
+    المصادقة عبر أول رسالة بعد فتح الاتصال: {"token": "<access_token>"}
+    (وليس ?token= في الرابط حتى لا يظهر التوكن في سجلات الوصول)
+    يُرجع المستخدم أو None بعد إغلاق الاتصال بالكود 1008
+    """
+    try:
+        message = await asyncio.wait_for(websocket.receive_json(), MEASURE_STREAM_AUTH_TIMEOUT)
+        token = message.get("token") if isinstance(message, dict) else None
+        if not isinstance(token, str):
+            raise ValueError("missing token")
+        return await authenticate_token(token)
+    except WebSocketDisconnect:
+        return None
+    except (asyncio.TimeoutError, HTTPException, KeyError, ValueError):
+        await websocket.close(code=1008)
+        return None
+
+
+@app.websocket("/ws/measure")
+async def measure_blood_pressure_stream(websocket: WebSocket):
+    """
+    قياس ضغط الدم من تدفق إطارات كاميرا
+
+    الاتصال: /ws/measure ثم أول رسالة نصية {"token": "<access_token>"}
+    والخادم يرد {"type": "ready"}. بعدها يرسل العميل كل إطار كرسالة
+    binary (JPEG/PNG)، ويستقبل رسائل JSON بالتقدير الجاري بعد كل دفعة.
+    إرسال النص "end" ينهي الجلسة ويحفظ التقدير النهائي كقياس ويُرجعه
+    مع التوصيات. عند خطأ في المعالجة يُرسل {"type": "error"} ويُغلق
+    الاتصال بالكود 1011.
+    """
+    await websocket.accept()
+    current_user = await authenticate_websocket(websocket)
+    if current_user is None:
+        return
+    await websocket.send_json({"type": "ready"})
+    
+    stream = FrameStream(MEASURE_STREAM_MAX_FPS, MEASURE_STREAM_BATCH_SIZE, MEASURE_STREAM_WINDOW)
+    loop = asyncio.get_running_loop()
+    
+    async def process_frames():
+        # دفعات متتالية: كل ما وصل أثناء معالجة الدفعة السابقة يشكل الدفعة التالية
+        while True:
+            await stream.ready.wait()
+            frames = stream.take()
+            if not frames:
+                if stream.closed:
+                    return
+                continue
+            processed = [
+                img for img in await asyncio.gather(*(preprocess_frame(frame) for frame in frames))
+                if img is not None
+            ]
+            stream.dropped += len(frames) - len(processed)
+            if processed:
+                with observe_stage("inference"):
+                    results = await inference_pool.run(
+                        bp_model.predict_batch, np.concatenate(processed, axis=0)
+                    )
+                metrics.inference_batch_size.observe(len(processed))
+                stream.processed += len(results)
+                stream.readings.extend((r['systolic'], r['diastolic']) for r in results)
+                await websocket.send_json(stream.snapshot(results))
+            if stream.closed and not stream.pending:
+                return
+    
+    async def receive_frames():
+        """يُرجع True عند "end" و False عند قطع الاتصال"""
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return False
+            frame = message.get("bytes")
+            if frame is not None:
+                if len(frame) > MEASURE_STREAM_MAX_FRAME_BYTES:
+                    stream.received += 1
+                    stream.dropped += 1
+                    continue
+                stream.offer(frame, loop.time())
+            elif (message.get("text") or "").strip() == "end":
+                return True
+    
+    processor = asyncio.create_task(process_frames())
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        # انتظار الاستقبال والمعالجة معاً: خطأ في المعالجة لا ينتظر الإطار التالي
+        await asyncio.wait({processor, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        if processor.done():
+            # المعالجة لا تنتهي قبل "end" إلا بخطأ
+            processor.result()
+        if not await receiver:
+            return
+        
+        # إنهاء الجلسة: معالجة الإطارات المتبقية ثم إرسال النتيجة النهائية
+        stream.closed = True
+        stream.ready.set()
+        await processor
+        
+        estimate = stream.estimate()
+        if estimate is None:
+            await websocket.send_json({"type": "final", "error": "لم يتم قياس أي إطار صالح"})
+            await websocket.close()
+            return
+        
+        async with AsyncSessionLocal() as db:
+            measurement = Measurement(
+                user_id=current_user.id,
+                systolic=estimate['systolic'],
+                diastolic=estimate['diastolic'],
+            )
+            db.add(measurement)
+            await db.commit()
+        recommendations_data = recommendations_ai.get_recommendations(
+            estimate['systolic'], estimate['diastolic']
+        )
+        await websocket.send_json({
+            **stream.snapshot(),
+            "type": "final",
+            "id": measurement.id,
+            "created_at": measurement.created_at.isoformat(),
+            "recommendations": recommendations_data['recommendations'],
+            "category": recommendations_data['category'],
+            "severity": recommendations_data['severity'],
+        })
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"خطأ في قياس متدفق: user_id={current_user.id}: {e}")
+        try:
+            await websocket.send_json({"type": "error", "error": f"خطأ في معالجة الإطارات: {str(e)}"})
+            await websocket.close(code=1011)
+        except (RuntimeError, WebSocketDisconnect):
+            # الاتصال مغلق مسبقاً
+            pass
+    finally:
+        for task in (receiver, processor):
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, WebSocketDisconnect):
+                    pass
+
+
+def encode_history_cursor(created_at, measurement_id):
+    return f"{created_at.isoformat()},{measurement_id}"
+
+
+def decode_history_cursor(cursor):
+    """cursor بصيغة <created_at>,<id> كما يُرجعه next_cursor"""
+    try:
+        created_at, measurement_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(created_at), int(measurement_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="قيمة before غير صحيحة - الصيغة المطلوبة: <created_at>,<id>"
+        )
+
+
 @app.get("/api/history")
 async def get_history(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    before: str = Query(None, description="next_cursor من الصفحة السابقة"),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
-    measurements = (
-        db.query(Measurement)
-        .filter(Measurement.user_id == current_user.id)
-        .order_by(Measurement.created_at.desc())
-        .limit(50)
-        .all()
+    """
+    سجل القياسات مع keyset pagination على الفهرس (user_id, created_at, id)
+    تكلفة أي صفحة مثل تكلفة الصفحة الأولى
+    """
+    cursor = decode_history_cursor(before) if before else None
+    
+    # فقط الأعمدة المستخدمة في الاستجابة
+    query = select(
+        Measurement.id,
+        Measurement.systolic,
+        Measurement.diastolic,
+        Measurement.created_at,
+    ).where(Measurement.user_id == current_user.id)
+    if cursor is not None:
+        cursor_created_at, cursor_id = cursor
+        query = query.where(or_(
+            Measurement.created_at < cursor_created_at,
+            and_(
+                Measurement.created_at == cursor_created_at,
+                Measurement.id < cursor_id,
+            ),
+        ))
+    # صف إضافي لمعرفة وجود صفحة تالية
+    query = query.order_by(Measurement.created_at.desc(), Measurement.id.desc()).limit(limit + 1)
+    
+    async with AsyncSessionLocal() as db:
+        measurements = (await db.execute(query)).all()
+    has_more = len(measurements) > limit
+    measurements = measurements[:limit]
+    
+    recommendations_batch = recommendations_ai.get_recommendations_batch(
+        [m.systolic for m in measurements],
+        [m.diastolic for m in measurements],
     )
     
     history = []
-    for m in measurements:
-        recommendations_data = recommendations_ai.get_recommendations(
-            m.systolic, m.diastolic
-        )
+    for m, recommendations_data in zip(measurements, recommendations_batch):
         history.append({
             "id": m.id,
             "systolic": m.systolic,
@@ -311,14 +965,19 @@ async def get_history(
             "recommendations": recommendations_data['recommendations'],
         })
     
-    return {"history": history}
+    next_cursor = None
+    if has_more:
+        last = measurements[-1]
+        next_cursor = encode_history_cursor(last.created_at, last.id)
+    
+    return {"history": history, "next_cursor": next_cursor}
 
 
 @app.post("/api/recommendations")
 async def get_recommendations(
     systolic: float,
     diastolic: float,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     recommendations_data = recommendations_ai.get_recommendations(systolic, diastolic)
     return recommendations_data
@@ -329,15 +988,11 @@ async def save_training_data(
     image: UploadFile = File(...),
     systolic: str = Form(...),
     diastolic: str = Form(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     """
     حفظ بيانات التدريب (صورة + قياسات حقيقية)
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    
     try:
         systolic_float = float(systolic)
         diastolic_float = float(diastolic)
@@ -347,37 +1002,47 @@ async def save_training_data(
             detail="القياسات يجب أن تكون أرقام صحيحة"
         )
     
-    # حفظ الصورة
-    file_path = UPLOAD_DIR / f"training_{current_user.id}_{datetime.now().timestamp()}.jpg"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    image_bytes = await image.read()
+    try:
+        pixels = await cpu_pool.run(bp_model.load_pixels, image_bytes)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="تعذر قراءة الصورة"
+        )
+    
+    # حفظ الصورة ونسختها 224x224 (الصور المكررة لا تُكتب مرة أخرى)
+    image_key, _ = await cpu_pool.run(blob_store.put_upload, image_bytes, pixels)
     
     try:
         # حفظ في قاعدة البيانات
-        training_data = TrainingData(
-            user_id=current_user.id,
-            image_path=str(file_path),
-            systolic=systolic_float,
-            diastolic=diastolic_float,
-            is_verified=1,  # تم التحقق من المستخدم
-        )
-        db.add(training_data)
-        db.commit()
-        db.refresh(training_data)
+        async with AsyncSessionLocal() as db:
+            training_data = TrainingData(
+                user_id=current_user.id,
+                image_path=image_key,
+                systolic=systolic_float,
+                diastolic=diastolic_float,
+                is_verified=1,  # تم التحقق من المستخدم
+            )
+            db.add(training_data)
+            await db.execute(add_blob_refs, blob_ref_rows([(image_key, len(image_bytes))]))
+            await db.execute(record_training_data([(systolic_float, diastolic_float)]))
+            await db.commit()
+            total = (await read_training_stats(db))['verified']
+        
+        # إعادة الكتابة إذا حذف gc الملف بين الحفظ الأول و commit (لا شيء يُكتب إذا كان موجوداً)
+        await persist_upload(image_key, image_bytes, pixels)
         
         logger.info(f"تم حفظ بيانات تدريب: user_id={current_user.id}, bp={systolic_float}/{diastolic_float}")
         
         return {
             "id": training_data.id,
             "message": "تم حفظ بيانات التدريب بنجاح",
-            "total_training_data": db.query(TrainingData).filter(
-                TrainingData.is_verified == 1
-            ).count()
+            "total_training_data": total
         }
     except Exception as e:
-        # حذف الصورة في حالة الخطأ
-        if file_path.exists():
-            file_path.unlink()
+        # الصورة لا تُحذف هنا: قد يشير إليها صف آخر بنفس المحتوى.
+        # الـ blobs بدون مراجع تُحذف عبر manage_uploads.py gc
         logger.error(f"خطأ في حفظ بيانات التدريب: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -385,60 +1050,241 @@ async def save_training_data(
         )
 
 
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 1000))
+
+
+async def read_training_stats(db):
+    """ملخص training_data من العدادات المحدثة (صفان بدلاً من COUNT(*))"""
+    return summarize((await db.execute(select(TrainingDataStats))).scalars().all())
+
+
+async def iter_training_csv(db, compress=False):
+    """
+    توليد CSV بيانات التدريب على دفعات من قاعدة البيانات (yield_per)
+    يُرجع كتلة bytes لكل EXPORT_CHUNK_ROWS صف، فيبقى استهلاك الذاكرة ثابتاً
+    مهما كان عدد الصفوف. مع compress=True تُضغط الكتل بـ gzip تدريجياً
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    gzip_stream = zlib.compressobj(wbits=31) if compress else None
+
+    def drain(final=False):
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        if gzip_stream is not None:
+            data = gzip_stream.compress(data)
+            if final:
+                data += gzip_stream.flush()
+        return data
+
+    def image_names(rows):
+        # نفس أسماء export_training_data.py (training_XXXXX.png / .jpg)
+        return [
+            training_image_name(row_id, blob_store.export_source(image_path))
+            for row_id, image_path, _, _ in rows
+        ]
+
+    writer.writerow(['image_name', 'systolic', 'diastolic'])
+    result = await db.stream(
+        select(TrainingData.id, TrainingData.image_path, TrainingData.systolic, TrainingData.diastolic)
+        .where(TrainingData.is_verified == 1)
+        .order_by(TrainingData.id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    async for rows in result.partitions():
+        names = await cpu_pool.run(image_names, rows)
+        writer.writerows(
+            (image_name, systolic, diastolic)
+            for image_name, (_, _, systolic, diastolic) in zip(names, rows)
+        )
+        yield drain()
+    yield drain(final=True)
+
+
 @app.get("/api/training-data/export")
 async def export_training_data(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    gzip: bool = Query(False, description="ضغط الملف بـ gzip"),
+    format: str = Query("csv", pattern="^(csv|json)$", description="csv (بث) أو json ({csv, count}) للتوافق"),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     """
     تصدير بيانات التدريب بصيغة CSV للتدريب
+    يتم بث الملف على دفعات (StreamingResponse) بدلاً من تحميله كاملاً في الذاكرة.
+    format=json يُرجع الشكل القديم {csv, count} (يُبنى في الذاكرة، للعملاء الحاليين فقط)
     """
-    training_data = db.query(TrainingData).filter(
-        TrainingData.is_verified == 1
-    ).all()
-    
-    if not training_data:
+    async with AsyncSessionLocal() as db:
+        has_data = (await db.execute(
+            select(exists().where(TrainingData.is_verified == 1))
+        )).scalar()
+    if not has_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="لا توجد بيانات تدريب"
         )
-    
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['image_name', 'systolic', 'diastolic'])
-    
-    for data in training_data:
-        image_name = os.path.basename(data.image_path)
-        writer.writerow([image_name, data.systolic, data.diastolic])
-    
-    return {
-        "csv": output.getvalue(),
-        "count": len(training_data),
-        "message": "استخدم هذا CSV مع سكريبت التدريب"
-    }
+
+    if format == "json":
+        async with AsyncSessionLocal() as db:
+            chunks = [chunk async for chunk in iter_training_csv(db)]
+        content = b''.join(chunks).decode('utf-8')
+        return {
+            "csv": content,
+            "count": content.count('\n') - 1,
+            "message": "استخدم هذا CSV مع سكريبت التدريب"
+        }
+
+    async def stream():
+        # جلسة خاصة بالبث تبقى مفتوحة حتى نهاية الملف (server-side cursor)
+        async with AsyncSessionLocal() as db:
+            async for chunk in iter_training_csv(db, compress=gzip):
+                if chunk:
+                    yield chunk
+
+    filename = "labels.csv.gz" if gzip else "labels.csv"
+    return StreamingResponse(
+        stream(),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @app.get("/api/training-data/stats")
 async def get_training_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     """إحصائيات بيانات التدريب"""
-    total = db.query(TrainingData).filter(
-        TrainingData.is_verified == 1
-    ).count()
+    async with AsyncSessionLocal() as db:
+        stats = await read_training_stats(db)
+    total = stats['verified']
     
     return {
         "total_training_data": total,
-        "minimum_required": 50,
-        "status": "ready" if total >= 50 else "collecting",
-        "message": "جاهز للتدريب" if total >= 50 else f"تحتاج {50 - total} صورة أخرى"
+        "pending_training_data": stats['pending'],
+        "systolic": stats['systolic'],
+        "diastolic": stats['diastolic'],
+        "minimum_required": MINIMUM_REQUIRED,
+        "status": "ready" if total >= MINIMUM_REQUIRED else "collecting",
+        "message": "جاهز للتدريب" if total >= MINIMUM_REQUIRED else f"تحتاج {MINIMUM_REQUIRED - total} صورة أخرى"
     }
 
 
+async def run_training_import(importer, archive_path):
+    """تشغيل استيراد أرشيف في الخلفية ثم حذف الملف المؤقت"""
+    try:
+        report = await import_pool.run(importer.run, bp_model.load_pixels, blob_store)
+        logger.info(
+            f"تم استيراد بيانات تدريب: import_id={importer.import_id}, "
+            f"imported={report['rows_imported']}, rejected={report['rows_rejected']}"
+        )
+    except Exception as e:
+        # الحالة محفوظة في training_imports؛ رفع نفس الأرشيف مرة أخرى يستأنف
+        logger.error(f"خطأ في استيراد بيانات التدريب {importer.import_id}: {e}")
+    finally:
+        importer.close()
+        os.unlink(archive_path)
+
+
+@app.post("/api/training-data/import", status_code=status.HTTP_202_ACCEPTED)
+async def import_training_data(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    archive: UploadFile = File(...),
+    verified: bool = Form(True),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """
+    استيراد بيانات تدريب بالجملة من أرشيف zip / tar (labels.csv + الصور)
+    يتم التحقق من الأرشيف فوراً ويعمل الاستيراد في الخلفية؛ التقدم عبر
+    GET /api/training-data/import/{import_id}. رفع نفس الأرشيف مرة أخرى
+    يستأنف الاستيراد المنقطع (202)، أو يُرجع التقرير النهائي إذا اكتمل (200)
+    """
+    try:
+        archive_path, archive_sha256 = await cpu_pool.run(spool_archive, archive.file)
+    except ImportArchiveTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    try:
+        importer = await cpu_pool.run(
+            ArchiveImport, archive_path, current_user.id, archive_sha256, archive.filename, verified
+        )
+    except ImportArchiveError as e:
+        os.unlink(archive_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    try:
+        report = await cpu_pool.run(importer.start)
+    except Exception:
+        importer.close()
+        os.unlink(archive_path)
+        raise
+
+    if report['status'] == 'completed':
+        # تم استيراده سابقاً: لا شيء في الانتظار
+        importer.close()
+        os.unlink(archive_path)
+        response.status_code = status.HTTP_200_OK
+    else:
+        background_tasks.add_task(run_training_import, importer, archive_path)
+    return report
+
+
+@app.get("/api/training-data/import/{import_id}")
+async def get_training_import(
+    import_id: int,
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """حالة وتقدم استيراد أرشيف بيانات تدريب"""
+    async with AsyncSessionLocal() as db:
+        record = await db.get(TrainingImport, import_id)
+    if record is None or record.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="الاستيراد غير موجود"
+        )
+    return import_report(record)
+
+
+@app.get("/api/inference/stats")
+async def get_inference_stats():
+    """إحصائيات دفعات الاستدلال (حجم الدفعة وزمن الانتظار)"""
+    return inference_batcher.stats()
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """إحصائيات الكاش (hit / miss / eviction) للتنبؤات والمستخدمين"""
+    return {
+        "predictions": {
+            **prediction_cache.stats(),
+            "singleflight": prediction_flights.stats(),
+        },
+        "users": user_cache.stats(),
+    }
+
+
+@app.get("/api/db/stats")
+async def get_db_stats():
+    """حالة connection pool لقاعدة البيانات (الحجم، المستخدم، الزائد، الإعدادات)"""
+    return pool_status(async_engine)
+
+
+@app.get("/api/pools/stats")
+async def get_pool_stats():
+    """إحصائيات تشبع مجمعات الخيوط (inference / cpu / import)"""
+    return pool_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """مقاييس بصيغة Prometheus (من عدادات داخل العملية)"""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     return {"message": "Blood Pressure Measurement API", "version": "1.0.0"}
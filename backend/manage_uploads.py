@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+سكريبت لصيانة مخزن الصور (storage.py)
+
+Usage:
+    python manage_uploads.py migrate     # نقل الصور القديمة (uploads/<user>_<ts>.jpg) إلى المخزن
+    python manage_uploads.py derive      # إنشاء النسخ 224x224 الناقصة (صور ما قبل مرحلة الرفع الجديدة)
+    python manage_uploads.py gc          # إعادة حساب المراجع وحذف الـ blobs غير المستخدمة
+
+migrate يحول كل image_path قديم (مسار ملف) في measurements و training_data
+إلى مفتاح blob، ويحذف الملف القديم بعد حفظ التغيير في قاعدة البيانات.
+gc يعيد حساب refcount من الجدولين ويحذف الـ blobs التي لا يشير إليها أي صف،
+بما فيها الملفات اليتيمة (رفع فشل حفظه في قاعدة البيانات). لا يُحذف blob أو
+ملف أحدث من --min-age. إعادة العد والحذف تتم في معاملة واحدة تقفل صفوف blobs،
+فيمكن تشغيله والخادم يعمل.
+"""
+import sys
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# إضافة مسار backend إلى Python path
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+from sqlalchemy import delete, func, select, update
+
+from database import SessionLocal, engine, init_db, Blob, Measurement, TrainingData
+from storage import BlobStore, add_blob_refs_statement, blob_ref_rows, is_blob_key
+
+MIGRATE_CHUNK_ROWS = 500
+DEFAULT_MIN_AGE = 3600
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def migrate_uploads(blob_store, chunk_rows=MIGRATE_CHUNK_ROWS):
+    """تحويل مسارات الصور القديمة إلى مفاتيح blobs"""
+    add_refs = add_blob_refs_statement(engine.dialect.name)
+    counts = {'migrated': 0, 'missing': 0}
+
+    for model in (Measurement, TrainingData):
+        last_id = 0
+        while True:
+            db = SessionLocal()
+            try:
+                rows = db.execute(
+                    select(model.id, model.image_path)
+                    .where(model.id > last_id, model.image_path.isnot(None))
+                    .order_by(model.id)
+                    .limit(chunk_rows)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                refs = []
+                originals = []
+                for row in rows:
+                    if is_blob_key(row.image_path):
+                        continue
+                    source = blob_store.resolve(row.image_path)
+                    if not source.exists():
+                        counts['missing'] += 1
+                        continue
+                    key, _ = blob_store.put_file(source)
+                    db.execute(update(model).where(model.id == row.id).values(image_path=key))
+                    refs.append((key, source.stat().st_size))
+                    originals.append(source)
+
+                if refs:
+                    db.execute(add_refs, blob_ref_rows(refs))
+                db.commit()
+            finally:
+                db.close()
+
+            # الملفات القديمة تُحذف فقط بعد حفظ المفاتيح الجديدة
+            for source in originals:
+                try:
+                    source.unlink()
+                except FileNotFoundError:
+                    pass
+            counts['migrated'] += len(originals)
+            print(f"✅ {model.__tablename__}: تم نقل {counts['migrated']} صورة حتى الآن")
+
+    return counts
+
+
+def create_derivatives(blob_store, workers=DEFAULT_WORKERS):
+    """إنشاء النسخة 224x224 لكل blob أصلي ليست له نسخة"""
+    from models.blood_pressure_model import BloodPressureCNN
+    preprocessor = BloodPressureCNN()
+
+    def derive(key):
+        try:
+            pixels = preprocessor.load_pixels(blob_store.path(key))
+        except ValueError:
+            return 'failed'
+        return 'created' if blob_store.put_derivative(key, pixels) else 'skipped'
+
+    keys = [key for key in blob_store.iter_keys() if not blob_store.derivative_path(key).exists()]
+    counts = {'created': 0, 'skipped': 0, 'failed': 0}
+    # cv2 يحرر الـ GIL أثناء فك الترميز وتغيير الحجم والترميز
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for done, result in enumerate(pool.map(derive, keys), 1):
+            counts[result] += 1
+            if done % 1000 == 0:
+                print(f"✅ تمت معالجة {done}/{len(keys)} صورة")
+    return counts
+
+
+def collect_garbage(blob_store, min_age=DEFAULT_MIN_AGE):
+    """
+    إعادة حساب refcount وحذف الـ blobs بدون مراجع في معاملة واحدة
+
+    صفوف blobs تُقفل أولاً (SELECT ... FOR UPDATE) ثم تُعد المراجع، فالرفع
+    المتزامن الذي يضيف مرجعاً ينتظر حتى نهاية المعاملة ثم يزيد العداد المصحح
+    بدلاً من أن يضيع مرجعه. الملفات لا تُحذف إذا عاد صف الـ blob بعد commit،
+    ومسارات الرفع تعيد كتابة الملف بعد commit إذا حُذف بينهما.
+    الـ blobs الأحدث من min_age لا تُحذف أبداً
+    """
+    cutoff = time.time() - min_age
+    created_cutoff = datetime.utcnow() - timedelta(seconds=min_age)
+    db = SessionLocal()
+    try:
+        blobs = db.execute(select(Blob).with_for_update()).scalars().all()
+
+        # المراجع الفعلية من الجدولين (بعد القفل)
+        references = {}
+        for model in (Measurement, TrainingData):
+            for key, count in db.execute(
+                select(model.image_path, func.count()).group_by(model.image_path)
+            ):
+                if is_blob_key(key):
+                    references[key] = references.get(key, 0) + count
+
+        fixed = 0
+        unreferenced = []
+        for blob in blobs:
+            actual = references.get(blob.key, 0)
+            if blob.refcount != actual:
+                blob.refcount = actual
+                fixed += 1
+            if actual <= 0 and blob.created_at is not None and blob.created_at < created_cutoff:
+                unreferenced.append(blob.key)
+        db.flush()
+
+        for start in range(0, len(unreferenced), MIGRATE_CHUNK_ROWS):
+            db.execute(delete(Blob).where(Blob.key.in_(unreferenced[start:start + MIGRATE_CHUNK_ROWS])))
+        db.commit()
+        known = set(db.execute(select(Blob.key)).scalars())
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    # إعادة التحقق قبل حذف الملفات: رفع متزامن لنفس المحتوى قد أعاد إنشاء صف
+    # blob بعد commit (على SQLite لا يوجد FOR UPDATE يوقفه)
+    db = SessionLocal()
+    try:
+        revived = set()
+        for start in range(0, len(unreferenced), MIGRATE_CHUNK_ROWS):
+            revived.update(db.execute(
+                select(Blob.key).where(Blob.key.in_(unreferenced[start:start + MIGRATE_CHUNK_ROWS]))
+            ).scalars())
+    finally:
+        db.close()
+    unreferenced = [key for key in unreferenced if key not in revived]
+    known |= revived
+
+    for key in unreferenced:
+        blob_store.delete(key)
+
+    # ملفات بدون صف في blobs: رفع لم يُحفظ في قاعدة البيانات.
+    # الملفات الحديثة قد تكون لطلب ما زال قيد التنفيذ فتُترك
+    orphans = 0
+    for key in blob_store.iter_keys():
+        if key in known or key in references:
+            continue
+        if blob_store.resolve(key).stat().st_mtime < cutoff:
+            blob_store.delete(key)
+            orphans += 1
+
+    return {'refcounts_fixed': fixed, 'unreferenced': len(unreferenced), 'orphans': orphans}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="صيانة مخزن الصور المرفوعة")
+    parser.add_argument('command', choices=['migrate', 'derive', 'gc'])
+    parser.add_argument('--upload-dir', default=None,
+                        help="مجلد المخزن (الافتراضي: UPLOAD_DIR أو backend/uploads)")
+    parser.add_argument('--min-age', type=int, default=DEFAULT_MIN_AGE,
+                        help="عمر الـ blob أو الملف اليتيم بالثواني قبل حذفه (gc)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="عدد خيوط إنشاء النسخ المصغرة (derive)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    init_db()
+    blob_store = BlobStore(args.upload_dir) if args.upload_dir else BlobStore()
+    print("=" * 60)
+    if args.command == 'migrate':
+        print("📦 نقل الصور القديمة إلى مخزن المحتوى")
+        print("=" * 60)
+        counts = migrate_uploads(blob_store)
+        print(f"\n✅ تم نقل {counts['migrated']} صورة (غير موجودة: {counts['missing']})")
+    elif args.command == 'derive':
+        print("🖼️ إنشاء نسخ 224x224 للصور المخزنة")
+        print("=" * 60)
+        counts = create_derivatives(blob_store, workers=args.workers)
+        print(f"\n✅ تم إنشاء {counts['created']} نسخة (فشل: {counts['failed']})")
+    else:
+        print("🧹 تنظيف مخزن الصور")
+        print("=" * 60)
+        counts = collect_garbage(blob_store, min_age=args.min_age)
+        print(f"\n✅ تصحيح {counts['refcounts_fixed']} عداد، "
+              f"حذف {counts['unreferenced']} blob بدون مراجع و {counts['orphans']} ملف يتيم")
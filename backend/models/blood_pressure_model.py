@@ -1,3 +1,5 @@
+import hashlib
+import time
 import numpy as np
 import cv2
 from tensorflow import keras
@@ -6,9 +8,17 @@ from tensorflow.keras import layers, Model
 from tensorflow.keras.optimizers import Adam
 import os
 
+from models.derivatives import DERIVATIVE_SIZE, find_derivative
+
+# محرك الاستدلال: keras (النموذج الكامل) أو tflite (ناتج export_model.py)
+INFERENCE_BACKENDS = ('keras', 'tflite')
+
+
 class BloodPressureCNN:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, inference_backend=None):
         self.model = None
+        # زمن تحميل النموذج بالثواني (None قبل التحميل)
+        self.load_seconds = None
         # تحديث المسار ليكون نسبي من backend/
         # استخدام مسار نسبي من موقع الملف
         if model_path is None:
@@ -17,11 +27,34 @@ class BloodPressureCNN:
         else:
             self.model_path = model_path
         
-    def build_model(self, input_shape=(224, 224, 3)):
-        """
-        بناء نموذج باستخدام Transfer Learning مع VGG16
-        VGG16 متوفر تلقائياً في TensorFlow - لا يحتاج تنزيل ملفات
-        """
+        # ملف TFLite بجانب ملف h5 بنفس الاسم
+        self.tflite_path = os.path.splitext(self.model_path)[0] + '.tflite'
+        
+        if inference_backend is None:
+            inference_backend = os.getenv('BP_INFERENCE_BACKEND', 'keras')
+        if inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(
+                f"Unknown inference backend '{inference_backend}', "
+                f"expected one of: {', '.join(INFERENCE_BACKENDS)}"
+            )
+        self.inference_backend = inference_backend
+        
+        # نسخة النموذج (تُستخدم كجزء من مفتاح الكاش) - تُحدث عند التحميل
+        if self.inference_backend == 'tflite' and os.path.exists(self.tflite_path):
+            self.model_version = self._file_version(self.tflite_path)
+        else:
+            self.model_version = self._file_version(self.model_path)
+        
+    def _file_version(self, path):
+        """معرّف نسخة النموذج من حجم الملف ووقت تعديله"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return f"{self.inference_backend}:untrained"
+        return f"{self.inference_backend}:{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    
+    def build_backbone(self, input_shape=(224, 224, 3)):
+        """VGG16 المدرب مسبقاً بدون الطبقات الأخيرة (مجمد)"""
         # استخدام VGG16 المدرب مسبقاً (متوفر في TensorFlow)
         base_model = VGG16(
             weights='imagenet',  # أوزان مدربة - متوفرة تلقائياً
@@ -31,177 +64,480 @@ class BloodPressureCNN:
         
         # تجميد الطبقات الأساسية (للتدريب السريع)
         base_model.trainable = False
-        
-        # إضافة طبقات جديدة للتنبؤ بضغط الدم
-        inputs = keras.Input(shape=input_shape)
-        x = base_model(inputs, training=False)
-        x = layers.GlobalAveragePooling2D()(x)
+        return base_model
+    
+    def add_head(self, x):
+        """طبقات التنبؤ بضغط الدم فوق ميزات VGG16 المجمعة (512)"""
         x = layers.Dense(512, activation='relu')(x)
         x = layers.Dropout(0.5)(x)
         x = layers.Dense(256, activation='relu')(x)
         x = layers.Dropout(0.3)(x)
-        outputs = layers.Dense(2, activation='linear')(x)  # systolic, diastolic
-        
-        model = Model(inputs, outputs)
-        
+        return layers.Dense(2, activation='linear')(x)  # systolic, diastolic
+    
+    def compile_model(self, model, learning_rate=0.001):
         model.compile(
-            optimizer=Adam(learning_rate=0.001),
+            optimizer=Adam(learning_rate=learning_rate),
             loss='mse',
             metrics=['mae']
         )
-        
         return model
     
-    def preprocess_image(self, image_path):
-        """Preprocess image for prediction"""
-        img = cv2.imread(image_path)
+    def build_model(self, input_shape=(224, 224, 3)):
+        """
+        بناء نموذج باستخدام Transfer Learning مع VGG16
+        VGG16 متوفر تلقائياً في TensorFlow - لا يحتاج تنزيل ملفات
+        """
+        base_model = self.build_backbone(input_shape)
+        
+        # إضافة طبقات جديدة للتنبؤ بضغط الدم
+        inputs = keras.Input(shape=input_shape)
+        x = base_model(inputs, training=False)
+        x = layers.GlobalAveragePooling2D()(x)
+        outputs = self.add_head(x)
+        
+        return self.compile_model(Model(inputs, outputs))
+    
+    def build_feature_extractor(self, input_shape=(224, 224, 3)):
+        """VGG16 + GlobalAveragePooling: صورة -> ميزات 512 (مدخل الـ head)"""
+        inputs = keras.Input(shape=input_shape)
+        x = self.build_backbone(input_shape)(inputs, training=False)
+        outputs = layers.GlobalAveragePooling2D()(x)
+        return Model(inputs, outputs, name='feature_extractor')
+    
+    def build_head_model(self, feature_dim=512):
+        """الـ head وحده على ميزات مخزنة مسبقاً"""
+        inputs = keras.Input(shape=(feature_dim,))
+        return self.compile_model(Model(inputs, self.add_head(inputs), name='head'))
+    
+    @staticmethod
+    def copy_head_weights(source, target):
+        """نسخ أوزان طبقات Dense بالترتيب من نموذج إلى آخر (head <-> النموذج الكامل)"""
+        source_dense = [layer for layer in source.layers if isinstance(layer, layers.Dense)]
+        target_dense = [layer for layer in target.layers if isinstance(layer, layers.Dense)]
+        if len(source_dense) != len(target_dense):
+            raise ValueError("Head layer structure does not match")
+        for src, dst in zip(source_dense, target_dense):
+            dst.set_weights(src.get_weights())
+    
+    def decode_image(self, image):
+        """
+        قراءة الصورة بصيغة BGR
+        image: مسار ملف، أو بايتات الصورة (bytes / bytearray / memoryview)
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            # فك الترميز من الذاكرة مباشرة دون المرور بالقرص
+            buffer = np.frombuffer(image, dtype=np.uint8)
+            img = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if buffer.size else None
+        else:
+            img = cv2.imread(str(image))
         if img is None:
             raise ValueError("Could not read image")
+        return img
+    
+    def load_pixels(self, image):
+        """الصورة بحجم مدخل النموذج كـ uint8 RGB (224, 224, 3) بدون تطبيع"""
+        if not isinstance(image, (bytes, bytearray, memoryview)):
+            # النسخة 224x224 المحفوظة عند الرفع تغني عن فك ترميز الأصل
+            image = find_derivative(image) or image
+        img = self.decode_image(image)
         
         # Resize to model input size
-        img = cv2.resize(img, (224, 224))
+        if img.shape[:2] != DERIVATIVE_SIZE:
+            img = cv2.resize(img, DERIVATIVE_SIZE)
         
         # Convert BGR to RGB
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    
+    @staticmethod
+    def normalize_pixels(pixels):
+        """uint8 (224, 224, 3) -> دفعة float32 (1, 224, 224, 3) في [0, 1]"""
         # Normalize
-        img = img.astype(np.float32) / 255.0
+        img = pixels.astype(np.float32) / 255.0
         
         # Expand dimensions for batch
-        img = np.expand_dims(img, axis=0)
+        return np.expand_dims(img, axis=0)
+    
+    def preprocess_image(self, image):
+        """Preprocess image for prediction (path or raw bytes)"""
+        return self.normalize_pixels(self.load_pixels(image))
+    
+    def cache_key(self, processed_img):
+        """
+        مفتاح الكاش لصورة معالجة: hash لبكسلات الصورة بعد فك الترميز
+        وتغيير الحجم + نسخة النموذج
+        """
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(processed_img).data, digest_size=16
+        ).hexdigest()
+        return f"{self.model_version}:{digest}"
+    
+    def load_model(self):
+        """تحميل النموذج المدرب (مرة واحدة فقط)"""
+        if self.model is not None:
+            return self.model
         
-        return img
+        started = time.perf_counter()
+        self.model = self._load()
+        self.load_seconds = time.perf_counter() - started
+        return self.model
     
-    def predict(self, image_path):
-        """التنبؤ بضغط الدم من الصورة"""
-        if self.model is None:
-            # محاولة تحميل النموذج المدرب
-            if os.path.exists(self.model_path):
-                try:
-                    self.model = keras.models.load_model(self.model_path)
-                    print("✅ تم تحميل النموذج المدرب بنجاح")
-                except Exception as e:
-                    print(f"⚠️ خطأ في تحميل النموذج: {e}")
-                    print("⚠️ استخدام Transfer Learning (غير مدرب)")
-                    self.model = self.build_model()
-            else:
-                print("⚠️ لا يوجد نموذج مدرب - استخدام Transfer Learning")
-                self.model = self.build_model()
-                print("⚠️ هذا نموذج غير مدرب - النتائج تجريبية")
+    def _load(self):
+        if self.inference_backend == 'tflite':
+            if os.path.exists(self.tflite_path):
+                from models.tflite_model import TFLiteModel
+                model = TFLiteModel(self.tflite_path)
+                self.model_version = self._file_version(self.tflite_path)
+                print(f"✅ تم تحميل نموذج TFLite: {self.tflite_path}")
+                return model
+            print(f"⚠️ نموذج TFLite غير موجود: {self.tflite_path} - استخدام Keras")
         
-        # معالجة الصورة
-        processed_img = self.preprocess_image(image_path)
+        self.model_version = self._file_version(self.model_path)
         
-        # التنبؤ
-        prediction = self.model.predict(processed_img, verbose=0)
+        # محاولة تحميل النموذج المدرب
+        if os.path.exists(self.model_path):
+            try:
+                model = keras.models.load_model(self.model_path)
+                print("✅ تم تحميل النموذج المدرب بنجاح")
+            except Exception as e:
+                print(f"⚠️ خطأ في تحميل النموذج: {e}")
+                print("⚠️ استخدام Transfer Learning (غير مدرب)")
+                model = self.build_model()
+        else:
+            print("⚠️ لا يوجد نموذج مدرب - استخدام Transfer Learning")
+            model = self.build_model()
+            print("⚠️ هذا نموذج غير مدرب - النتائج تجريبية")
         
-        # استخراج النتائج
-        systolic = float(prediction[0][0])
-        diastolic = float(prediction[0][1])
+        return model
+    
+    def predict_batch(self, images):
+        """
+        التنبؤ بضغط الدم لدفعة من الصور المعالجة مسبقاً
         
-        # التأكد من القيم المعقولة
-        systolic = max(90, min(180, systolic))
-        diastolic = max(60, min(120, diastolic))
+        images: مصفوفة بالشكل (N, 224, 224, 3) كما تُرجعها preprocess_image
+        يُرجع قائمة بطول N من {'systolic', 'diastolic'}
+        """
+        model = self.load_model()
         
-        return {
-            'systolic': round(systolic, 1),
-            'diastolic': round(diastolic, 1)
-        }
+        # التنبؤ (تمريرة واحدة للدفعة كاملة)
+        predictions = model.predict_on_batch(images)
+        
+        results = []
+        for prediction in predictions:
+            systolic = float(prediction[0])
+            diastolic = float(prediction[1])
+            
+            # التأكد من القيم المعقولة
+            systolic = max(90, min(180, systolic))
+            diastolic = max(60, min(120, diastolic))
+            
+            results.append({
+                'systolic': round(systolic, 1),
+                'diastolic': round(diastolic, 1)
+            })
+        
+        return results
     
-    def train(self, train_data_dir, epochs=50, batch_size=32):
+    def predict(self, image):
+        """التنبؤ بضغط الدم من الصورة (مسار أو بايتات)"""
+        # معالجة الصورة
+        processed_img = self.preprocess_image(image)
+        
+        return self.predict_batch(processed_img)[0]
+    
+    def train(self, train_data_dir, epochs=50, batch_size=32, validation_split=0.2, cache=None, use_packed=True,
+              checkpoint_dir=None):
         """
         تدريب النموذج على البيانات
         
         train_data_dir يجب أن يحتوي على:
         - images/ (مجلد الصور)
         - labels.csv (ملف CSV مع: image_name, systolic, diastolic)
+        
+        cache: None، 'memory'، أو مسار ملف لتخزين الصور المفكوكة بين الـ epochs
+        use_packed: استخدام shards من pack_dataset.py إذا كانت محدثة
+        checkpoint_dir: حفظ نقطة استئناف بعد كل epoch في checkpoint_dir/full؛
+        التشغيل الكامل المنقطع يستأنف منها (التدريب التزايدي له مجلده الخاص)
         """
-        from tensorflow.keras.preprocessing.image import ImageDataGenerator
-        import pandas as pd
+        from models.data_pipeline import make_train_validation_datasets
+        
+        run_dir = self._mode_checkpoint_dir(checkpoint_dir, 'full')
+        self._clear_legacy_checkpoints(checkpoint_dir)
         
         # بناء النموذج
         print("🔨 بناء النموذج باستخدام Transfer Learning (VGG16)...")
         self.model = self.build_model()
         
-        # قراءة البيانات
-        labels_path = os.path.join(train_data_dir, 'labels.csv')
-        if not os.path.exists(labels_path):
-            raise FileNotFoundError(
-                f"❌ ملف labels.csv غير موجود في: {train_data_dir}\n"
-                f"📁 يجب أن يحتوي المجلد على:\n"
-                f"   - images/ (مجلد الصور)\n"
-                f"   - labels.csv (ملف CSV)"
-            )
-        
-        labels_df = pd.read_csv(labels_path)
-        
-        # التحقق من الأعمدة
-        required_cols = ['image_name', 'systolic', 'diastolic']
-        for col in required_cols:
-            if col not in labels_df.columns:
-                raise ValueError(
-                    f"❌ العمود '{col}' غير موجود في labels.csv\n"
-                    f"📋 الأعمدة المطلوبة: {', '.join(required_cols)}"
-                )
-        
-        images_dir = os.path.join(train_data_dir, 'images')
-        if not os.path.exists(images_dir):
-            raise FileNotFoundError(f"❌ مجلد الصور غير موجود: {images_dir}")
-        
-        print(f"✅ تم العثور على {len(labels_df)} صورة في labels.csv")
-        
-        # معالجة البيانات
-        datagen = ImageDataGenerator(
-            rescale=1./255,
-            validation_split=0.2,
-            rotation_range=20,
-            width_shift_range=0.2,
-            height_shift_range=0.2,
-            horizontal_flip=True
+        # خط إدخال tf.data (فك ترميز وتكبير متوازي + prefetch)
+        train_dataset, validation_dataset, train_count, validation_count = make_train_validation_datasets(
+            train_data_dir,
+            batch_size=batch_size,
+            validation_split=validation_split,
+            cache=cache,
+            use_packed=use_packed,
         )
         
-        # Generator للتدريب
-        train_generator = datagen.flow_from_dataframe(
-            labels_df,
-            directory=images_dir,
-            x_col='image_name',
-            y_col=['systolic', 'diastolic'],
-            target_size=(224, 224),
-            batch_size=batch_size,
-            class_mode='raw',
-            subset='training'
+        print(f"✅ تم العثور على {train_count + validation_count} صورة في labels.csv")
+        print(f"📊 بيانات التدريب: {train_count} صورة")
+        print(f"📊 بيانات التحقق: {validation_count} صورة")
+        
+        # التدريب
+        print("\n🚀 بدء التدريب...")
+        print("⏳ هذا قد يستغرق بعض الوقت...\n")
+        
+        history = self.model.fit(
+            train_dataset,
+            epochs=epochs,
+            validation_data=validation_dataset,
+            callbacks=self._checkpoint_callbacks(run_dir),
+            verbose=1
         )
         
-        # Generator للتحقق
-        validation_generator = datagen.flow_from_dataframe(
-            labels_df,
-            directory=images_dir,
-            x_col='image_name',
-            y_col=['systolic', 'diastolic'],
-            target_size=(224, 224),
+        self.save_model()
+        self.save_training_state(train_data_dir, mode='full')
+        # يشمل أي تدريب تزايدي منقطع: كان مبنياً على النموذج السابق
+        self._clear_checkpoints(checkpoint_dir)
+        
+        return history
+    
+    def train_head(self, train_data_dir, epochs=50, batch_size=32, validation_split=0.2, feature_store_dir=None):
+        """
+        تدريب سريع للـ head فقط على ميزات VGG16 مخزنة مسبقاً
+        
+        VGG16 مجمد، لذلك تُحسب ميزات كل صورة مرة واحدة وتُخزن في
+        FeatureStore (memmap)، ويعاد استخدامها في التشغيلات اللاحقة مع حساب
+        ميزات الصور الجديدة فقط. ملاحظة: لا يوجد تكبير بيانات في هذا الوضع
+        لأن الميزات محسوبة مسبقاً.
+        """
+        from models.data_pipeline import load_labels, split_labels, make_dataset
+        from models.feature_store import FeatureStore
+        
+        labels_df, images_dir = load_labels(train_data_dir)
+        store = FeatureStore(feature_store_dir or os.path.join(train_data_dir, 'features'))
+        print(f"✅ تم العثور على {len(labels_df)} صورة في labels.csv ({len(store)} ميزات مخزنة)")
+        
+        extractor = None
+        
+        def extract(paths):
+            nonlocal extractor
+            if extractor is None:
+                extractor = self.build_feature_extractor()
+            dataset = make_dataset(
+                paths, np.zeros((len(paths), 2), np.float32),
+                batch_size=batch_size, training=False,
+            ).map(lambda images, _: images)
+            return extractor.predict(dataset, verbose=0)
+        
+        paths_by_key = {
+            name: os.path.join(images_dir, name) for name in labels_df['image_name']
+        }
+        print("🔍 حساب ميزات VGG16 للصور الجديدة...")
+        computed = store.update(paths_by_key, extract)
+        print(f"✅ تم حساب ميزات {computed} صورة (تم إعادة استخدام {len(paths_by_key) - computed})")
+        
+        train_df, validation_df = split_labels(labels_df, validation_split)
+        
+        def arrays(df):
+            return (
+                store.get(list(df['image_name'])),
+                df[['systolic', 'diastolic']].to_numpy(dtype=np.float32),
+            )
+        
+        x_train, y_train = arrays(train_df)
+        validation_data = arrays(validation_df) if len(validation_df) else None
+        print(f"📊 بيانات التدريب: {len(train_df)} صورة")
+        print(f"📊 بيانات التحقق: {len(validation_df)} صورة")
+        
+        print("\n🚀 بدء تدريب الـ head على الميزات المخزنة...")
+        head = self.build_head_model(store.dim)
+        history = head.fit(
+            x_train, y_train,
+            epochs=epochs,
             batch_size=batch_size,
-            class_mode='raw',
-            subset='validation'
+            validation_data=validation_data,
+            shuffle=True,
+            verbose=1
         )
         
-        print(f"📊 بيانات التدريب: {train_generator.samples} صورة")
-        print(f"📊 بيانات التحقق: {validation_generator.samples} صورة")
+        # تركيب الـ head المدرب فوق VGG16 في النموذج الكامل المستخدم للاستدلال
+        self.model = self.build_model()
+        self.copy_head_weights(head, self.model)
         
-        # التدريب
-        print("\n🚀 بدء التدريب...")
-        print("⏳ هذا قد يستغرق بعض الوقت...\n")
+        self.save_model()
+        self.save_training_state(train_data_dir, mode='head')
+        
+        return history
+    
+    def fine_tune(self, train_data_dir, epochs=5, batch_size=32, replay_ratio=1.0, learning_rate=1e-4,
+                  validation_split=0.2, checkpoint_dir=None, seed=None):
+        """
+        تدريب تزايدي: تحميل النموذج الحالي وضبطه على الصفوف المضافة منذ آخر
+        تدريب (watermark = أكبر TrainingData.id تم التدريب عليه) مع عينة
+        إعادة (replay) من البيانات القديمة بنسبة replay_ratio لتجنب النسيان
+        
+        يتم حفظ نقطة استئناف بعد كل epoch في checkpoint_dir/fine_tune؛ إعادة
+        تشغيل تدريب منقطع تستأنف من آخر epoch بنفس اختيار البيانات.
+        يحتاج manifest.json من export_training_data.py لمعرفة id كل صورة.
+        """
+        import json
+        import pandas as pd
+        from models.data_pipeline import load_labels, load_row_ids, split_labels, make_dataset
+        
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"❌ لا يوجد نموذج مدرب في: {self.model_path}\n"
+                f"💡 شغّل التدريب الكامل أولاً: python train_model.py"
+            )
+        
+        labels_df, images_dir = load_labels(train_data_dir)
+        row_ids = load_row_ids(train_data_dir)
+        if row_ids is None:
+            raise FileNotFoundError(
+                f"❌ manifest.json غير موجود في: {train_data_dir}\n"
+                f"💡 شغّل export_training_data.py أولاً"
+            )
+        labels_df = labels_df[labels_df['image_name'].isin(row_ids)].reset_index(drop=True)
+        ids = labels_df['image_name'].map(row_ids)
+        
+        checkpoint_dir = checkpoint_dir or self.default_checkpoint_dir()
+        self._clear_legacy_checkpoints(checkpoint_dir)
+        run_dir = self._mode_checkpoint_dir(checkpoint_dir, 'fine_tune')
+        run_path = os.path.join(run_dir, 'run.json')
+        if os.path.exists(run_path):
+            # استئناف: نفس نطاق الصفوف ونفس عينة الإعادة
+            with open(run_path, encoding='utf-8') as f:
+                run = json.load(f)
+            print(f"♻️ استئناف تدريب تزايدي منقطع ({run['watermark']} < id <= {run['upper']})")
+        else:
+            # نقطة استئناف بدون run.json لا يمكن ربطها بتشغيل معروف
+            self._clear_checkpoints(run_dir)
+            run = {
+                'watermark': self.load_training_state().get('watermark') or 0,
+                'upper': int(ids.max()) if len(ids) else 0,
+                'seed': seed if seed is not None else int(np.random.randint(2 ** 31)),
+            }
+        
+        new_df = labels_df[(ids > run['watermark']) & (ids <= run['upper'])]
+        old_df = labels_df[ids <= run['watermark']]
+        if new_df.empty:
+            print(f"✅ لا توجد بيانات جديدة منذ آخر تدريب (watermark={run['watermark']})")
+            self._clear_checkpoints(run_dir)
+            return None
+        
+        os.makedirs(run_dir, exist_ok=True)
+        with open(run_path, 'w', encoding='utf-8') as f:
+            json.dump(run, f)
+        
+        replay_count = min(len(old_df), int(round(len(new_df) * replay_ratio)))
+        replay_df = old_df.sample(n=replay_count, random_state=run['seed'])
+        combined = pd.concat([new_df, replay_df], ignore_index=True)
+        train_df, validation_df = split_labels(combined, validation_split)
+        if train_df.empty:
+            train_df, validation_df = combined, combined.iloc[:0]
+        
+        print(f"📊 صفوف جديدة: {len(new_df)} | إعادة من القديم: {len(replay_df)}")
+        print(f"📊 بيانات التدريب: {len(train_df)} صورة")
+        print(f"📊 بيانات التحقق: {len(validation_df)} صورة")
+        
+        def dataset(df, training):
+            return make_dataset(
+                [os.path.join(images_dir, name) for name in df['image_name']],
+                df[['systolic', 'diastolic']].to_numpy(dtype=np.float32),
+                batch_size=batch_size, training=training, seed=run['seed'],
+            )
         
+        print(f"🔄 تحميل النموذج الحالي: {self.model_path}")
+        self.model = keras.models.load_model(self.model_path, compile=False)
+        self.compile_model(self.model, learning_rate=learning_rate)
+        
+        print("\n🚀 بدء التدريب التزايدي...")
         history = self.model.fit(
-            train_generator,
+            dataset(train_df, training=True),
             epochs=epochs,
-            validation_data=validation_generator,
+            validation_data=dataset(validation_df, training=False) if len(validation_df) else None,
+            callbacks=self._checkpoint_callbacks(run_dir),
             verbose=1
         )
         
-        # حفظ النموذج
+        self.save_model()
+        self.save_training_state(train_data_dir, mode='fine_tune', watermark=run['upper'])
+        self._clear_checkpoints(run_dir)
+        
+        return history
+    
+    def default_checkpoint_dir(self):
+        return os.path.splitext(self.model_path)[0] + '_checkpoints'
+    
+    @staticmethod
+    def _mode_checkpoint_dir(checkpoint_dir, mode):
+        """مجلد استئناف منفصل لكل نوع تدريب (full / fine_tune) حتى لا يستأنف أحدهما أوزان الآخر"""
+        return os.path.join(checkpoint_dir, mode) if checkpoint_dir else None
+    
+    @staticmethod
+    def _clear_legacy_checkpoints(checkpoint_dir):
+        """حذف نقاط الاستئناف المشتركة القديمة (checkpoint_dir/backup) المجهول نوع تدريبها"""
+        if not checkpoint_dir:
+            return
+        import shutil
+        shutil.rmtree(os.path.join(checkpoint_dir, 'backup'), ignore_errors=True)
+        legacy_run = os.path.join(checkpoint_dir, 'run.json')
+        if os.path.exists(legacy_run):
+            os.remove(legacy_run)
+    
+    @staticmethod
+    def _checkpoint_callbacks(checkpoint_dir):
+        """نقطة استئناف بعد كل epoch (أوزان + optimizer + رقم الـ epoch)"""
+        if not checkpoint_dir:
+            return []
+        return [keras.callbacks.BackupAndRestore(os.path.join(checkpoint_dir, 'backup'))]
+    
+    @staticmethod
+    def _clear_checkpoints(checkpoint_dir):
+        if checkpoint_dir and os.path.isdir(checkpoint_dir):
+            import shutil
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    
+    def save_model(self):
+        """حفظ النموذج عبر ملف مؤقت ثم os.replace حتى لا يقرأ الخادم ملفاً نصف مكتوب"""
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-        self.model.save(self.model_path)
+        root, ext = os.path.splitext(self.model_path)
+        tmp_path = f"{root}.tmp{ext}"
+        self.model.save(tmp_path)
+        os.replace(tmp_path, self.model_path)
+        self.model_version = self._file_version(self.model_path)
         print(f"\n✅ تم حفظ النموذج في: {self.model_path}")
+    
+    @property
+    def training_state_path(self):
+        return os.path.splitext(self.model_path)[0] + '.state.json'
+    
+    def load_training_state(self):
+        """حالة آخر تدريب (watermark، الوضع، الوقت) أو {}"""
+        import json
+        try:
+            with open(self.training_state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_training_state(self, train_data_dir, mode, watermark=None):
+        """
+        تسجيل watermark بعد التدريب: أكبر TrainingData.id في البيانات المصدرة
+        (من manifest.json) حتى يبدأ التدريب التزايدي التالي بعده
+        """
+        import json
+        from datetime import datetime
+        from models.data_pipeline import load_row_ids
         
-        return history
-
+        if watermark is None:
+            row_ids = load_row_ids(train_data_dir)
+            watermark = max(row_ids.values()) if row_ids else None
+        state = {
+            'watermark': watermark,
+            'mode': mode,
+            'trained_at': datetime.utcnow().isoformat(),
+            'model_version': self.model_version,
+        }
+        tmp_path = self.training_state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.training_state_path)
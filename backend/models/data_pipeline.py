@@ -0,0 +1,213 @@
+"""
+خط إدخال بيانات التدريب باستخدام tf.data
+
+يقرأ labels.csv، يقسم البيانات إلى تدريب/تحقق بشكل حتمي، ويفك ترميز
+الصور ويغير حجمها بالتوازي (AUTOTUNE) مع cache اختياري و shuffle و prefetch.
+"""
+import os
+import zlib
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers
+
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_SIZE = (224, 224)
+REQUIRED_COLUMNS = ('image_name', 'systolic', 'diastolic')
+
+
+def load_labels(train_data_dir):
+    """
+    قراءة labels.csv والتحقق من الأعمدة ومجلد الصور
+    يُرجع (labels_df, images_dir)
+    """
+    import pandas as pd
+
+    labels_path = os.path.join(train_data_dir, 'labels.csv')
+    if not os.path.exists(labels_path):
+        raise FileNotFoundError(
+            f"❌ ملف labels.csv غير موجود في: {train_data_dir}\n"
+            f"📁 يجب أن يحتوي المجلد على:\n"
+            f"   - images/ (مجلد الصور)\n"
+            f"   - labels.csv (ملف CSV)"
+        )
+
+    labels_df = pd.read_csv(labels_path)
+
+    # التحقق من الأعمدة
+    for col in REQUIRED_COLUMNS:
+        if col not in labels_df.columns:
+            raise ValueError(
+                f"❌ العمود '{col}' غير موجود في labels.csv\n"
+                f"📋 الأعمدة المطلوبة: {', '.join(REQUIRED_COLUMNS)}"
+            )
+
+    images_dir = os.path.join(train_data_dir, 'images')
+    if not os.path.exists(images_dir):
+        raise FileNotFoundError(f"❌ مجلد الصور غير موجود: {images_dir}")
+
+    return labels_df, images_dir
+
+
+def load_row_ids(train_data_dir):
+    """
+    image_name -> TrainingData.id من manifest.json الذي يكتبه
+    export_training_data.py، أو None إذا لم يكن موجوداً
+    """
+    import json
+
+    manifest_path = os.path.join(train_data_dir, 'manifest.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            entries = json.load(f).get('entries', {})
+    except (OSError, ValueError):
+        return None
+    return {entry['image_name']: int(row_id) for row_id, entry in entries.items()}
+
+
+def is_validation(image_name, validation_split=0.2):
+    """
+    تقسيم حتمي حسب hash اسم الصورة: نفس الصورة تبقى دائماً في نفس
+    المجموعة بين التشغيلات، حتى عند إضافة بيانات جديدة
+    """
+    bucket = zlib.crc32(str(image_name).encode('utf-8')) % 10000
+    return bucket < validation_split * 10000
+
+
+def split_labels(labels_df, validation_split=0.2):
+    """تقسيم labels_df إلى (train_df, validation_df)"""
+    mask = labels_df['image_name'].map(lambda name: is_validation(name, validation_split))
+    return labels_df[~mask].reset_index(drop=True), labels_df[mask].reset_index(drop=True)
+
+
+def decode_image(path):
+    """قراءة وفك ترميز صورة (JPEG/PNG) وتغيير حجمها إلى 224x224 كـ uint8 RGB"""
+    image = tf.io.decode_image(
+        tf.io.read_file(path), channels=3, expand_animations=False
+    )
+    image = tf.image.resize(image, IMAGE_SIZE)
+    image.set_shape(IMAGE_SIZE + (3,))
+    return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+
+
+def normalize(images):
+    """uint8 [0, 255] -> float32 [0, 1] (نفس معالجة preprocess_image)"""
+    return tf.cast(images, tf.float32) / 255.0
+
+
+def build_augmenter(seed=None):
+    """
+    نفس تكبير البيانات السابق في ImageDataGenerator:
+    دوران 20 درجة، إزاحة 20%، وقلب أفقي
+    """
+    return tf.keras.Sequential([
+        layers.RandomFlip('horizontal', seed=seed),
+        layers.RandomRotation(20 / 360, fill_mode='nearest', seed=seed),
+        layers.RandomTranslation(0.2, 0.2, fill_mode='nearest', seed=seed),
+    ], name='augmentation')
+
+
+def make_dataset(
+    image_paths,
+    labels,
+    batch_size=32,
+    training=False,
+    cache=None,
+    augment=True,
+    shuffle_buffer=1024,
+    seed=None,
+):
+    """
+    بناء tf.data.Dataset من مسارات الصور والقيم (systolic, diastolic)
+
+    cache: None بدون cache، 'memory' في الذاكرة، أو مسار ملف على القرص.
+    الصور المخزنة في الـ cache هي uint8 بعد تغيير الحجم (ربع حجم float32)،
+    والتكبير يطبق بعد الـ cache حتى يختلف في كل epoch.
+    """
+    labels = np.asarray(labels, dtype=np.float32).reshape(-1, 2)
+    dataset = tf.data.Dataset.from_tensor_slices((list(image_paths), labels))
+    dataset = dataset.map(
+        lambda path, label: (decode_image(path), label),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not training,
+    )
+
+    if cache == 'memory':
+        dataset = dataset.cache()
+    elif cache:
+        os.makedirs(os.path.dirname(os.path.abspath(cache)), exist_ok=True)
+        dataset = dataset.cache(cache)
+
+    if training:
+        dataset = dataset.shuffle(
+            min(shuffle_buffer, len(labels)) or 1, seed=seed, reshuffle_each_iteration=True
+        )
+
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(lambda images, y: (normalize(images), y), num_parallel_calls=AUTOTUNE)
+
+    if training and augment:
+        augmenter = build_augmenter(seed)
+        dataset = dataset.map(
+            lambda images, y: (augmenter(images, training=True), y),
+            num_parallel_calls=AUTOTUNE,
+        )
+
+    return dataset.prefetch(AUTOTUNE)
+
+
+def make_train_validation_datasets(
+    train_data_dir,
+    batch_size=32,
+    validation_split=0.2,
+    cache=None,
+    seed=None,
+    use_packed=True,
+    packed_dir=None,
+):
+    """
+    بناء (train_ds, val_ds, train_count, val_count) من مجلد التدريب
+    cache كما في make_dataset؛ مسار القرص يُستخدم كبادئة لملفي train/val
+
+    إذا وُجدت shards مضغوطة مسبقاً (pack_dataset.py) ومطابقة لـ labels.csv
+    تُقرأ عبر memmap بدلاً من فك ترميز الصور (use_packed=False لتعطيل ذلك)
+    """
+    if use_packed:
+        from models.packed_dataset import PackedDataset
+
+        packed = PackedDataset.open_if_current(train_data_dir, packed_dir)
+        if packed is not None:
+            print(f"📦 استخدام البيانات المضغوطة مسبقاً: {packed.directory}")
+            mask = np.array([is_validation(name, validation_split) for name in packed.names], dtype=bool)
+            train_idx, val_idx = np.flatnonzero(~mask), np.flatnonzero(mask)
+            train_ds = packed.to_tf_dataset(train_idx, batch_size=batch_size, training=True, seed=seed)
+            val_ds = packed.to_tf_dataset(val_idx, batch_size=batch_size) if len(val_idx) else None
+            return train_ds, val_ds, len(train_idx), len(val_idx)
+
+    labels_df, images_dir = load_labels(train_data_dir)
+    train_df, val_df = split_labels(labels_df, validation_split)
+
+    def paths(df):
+        return [os.path.join(images_dir, name) for name in df['image_name']]
+
+    def values(df):
+        return df[['systolic', 'diastolic']].to_numpy(dtype=np.float32)
+
+    def cache_for(subset, df):
+        if cache in (None, 'memory'):
+            return cache
+        # الـ cache على القرص مرتبط بمحتوى القائمة حتى لا يُستخدم cache قديم
+        # بعد تغير labels.csv
+        fingerprint = zlib.crc32(df.to_csv(index=False).encode('utf-8'))
+        return f"{cache}.{subset}.{fingerprint:08x}"
+
+    train_ds = make_dataset(
+        paths(train_df), values(train_df), batch_size=batch_size,
+        training=True, cache=cache_for('train', train_df), seed=seed,
+    )
+    val_ds = make_dataset(
+        paths(val_df), values(val_df), batch_size=batch_size,
+        training=False, cache=cache_for('val', val_df),
+    ) if len(val_df) else None
+
+    return train_ds, val_ds, len(train_df), len(val_df)
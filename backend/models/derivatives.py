@@ -0,0 +1,38 @@
+"""
+نسخ مصغرة (derivatives) للصور بحجم مدخل النموذج
+
+عند الرفع تُحفظ بجانب كل صورة نسخة 224x224 بصيغة PNG (بدون فقد):
+<path>.224.png. بكسلاتها مطابقة تماماً لما تنتجه load_pixels من الأصل،
+وفك ترميزها أسرع بكثير من JPEG كامل الحجم من كاميرا الهاتف، لذلك
+load_pixels والمصدّر والتدريب يستخدمونها تلقائياً عند وجودها.
+"""
+import os
+
+import cv2
+
+DERIVATIVE_SIZE = (224, 224)
+DERIVATIVE_SUFFIX = '.224.png'
+# ضغط PNG منخفض: ترميز وفك ترميز أسرع مقابل ملف أكبر قليلاً
+PNG_COMPRESSION = 1
+
+
+def derivative_path(path):
+    """مسار النسخة المصغرة لملف صورة"""
+    return f"{os.fspath(path)}{DERIVATIVE_SUFFIX}"
+
+
+def find_derivative(path):
+    """مسار النسخة المصغرة إن وُجدت، وإلا None"""
+    candidate = derivative_path(path)
+    return candidate if os.path.exists(candidate) else None
+
+
+def encode_derivative(pixels):
+    """uint8 RGB (224, 224, 3) كما تُرجعها load_pixels -> بايتات PNG"""
+    ok, buffer = cv2.imencode(
+        '.png', cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR),
+        [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION],
+    )
+    if not ok:
+        raise ValueError("Could not encode derivative image")
+    return buffer.tobytes()
@@ -0,0 +1,125 @@
+"""
+مخزن ميزات VGG16 المجمعة (512) لكل صورة تدريب
+
+VGG16 مجمد أثناء التدريب، لذلك ميزات كل صورة ثابتة: تُحسب مرة واحدة
+وتُخزن في ملف float32 متصل يُقرأ كـ memmap، مع فهرس JSON يربط اسم الصورة
+برقم الصف. التشغيلات اللاحقة تحسب فقط ميزات الصور الجديدة أو المتغيرة.
+"""
+import json
+import os
+
+import numpy as np
+
+FEATURES_FILE = 'features.f32'
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+
+
+class FeatureStore:
+    """
+    store = FeatureStore(directory, backbone='vgg16-imagenet-gap')
+    store.update(paths_by_key, extract_fn)   # حساب الميزات الناقصة فقط
+    features = store.get(keys)               # (N, dim) float32
+    """
+
+    def __init__(self, directory, dim=512, backbone='vgg16-imagenet-gap'):
+        self.directory = directory
+        self.dim = dim
+        self.backbone = backbone
+        self.features_path = os.path.join(directory, FEATURES_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._entries = {}
+        self._rows = 0
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            index = json.load(f)
+        if (index.get('version') != INDEX_VERSION
+                or index.get('backbone') != self.backbone
+                or index.get('dim') != self.dim):
+            # ميزات من backbone مختلف لا يمكن استخدامها
+            return
+        self._entries = index['entries']
+        self._rows = index['rows']
+
+    def _save_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'backbone': self.backbone,
+                'dim': self.dim,
+                'rows': self._rows,
+                'entries': self._entries,
+            }, f)
+        os.replace(tmp, self.index_path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def _fingerprint(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def missing(self, paths_by_key):
+        """المفاتيح التي لا توجد ميزاتها أو تغير ملف صورتها"""
+        missing = []
+        for key, path in paths_by_key.items():
+            entry = self._entries.get(key)
+            if entry is None or entry['file'] != self._fingerprint(path):
+                missing.append(key)
+        return missing
+
+    def update(self, paths_by_key, extract_fn, batch_size=256):
+        """
+        حساب ميزات الصور الجديدة/المتغيرة فقط وإلحاقها بالمخزن
+        extract_fn(list_of_paths) -> np.ndarray (N, dim)
+        يُرجع عدد الصور التي حُسبت ميزاتها
+        """
+        missing = self.missing(paths_by_key)
+        if not missing:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        mode = 'r+b' if self._rows and os.path.exists(self.features_path) else 'wb'
+        if mode == 'wb':
+            self._rows = 0
+            self._entries = {}
+
+        with open(self.features_path, mode) as f:
+            for start in range(0, len(missing), batch_size):
+                keys = missing[start:start + batch_size]
+                paths = [paths_by_key[key] for key in keys]
+                features = np.asarray(extract_fn(paths), dtype=np.float32).reshape(len(keys), self.dim)
+
+                # الإلحاق بعد آخر صف مسجل في الفهرس (يتجاهل بقايا تشغيل منقطع)
+                f.seek(self._rows * self.dim * 4)
+                f.write(features.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+                for offset, (key, path) in enumerate(zip(keys, paths)):
+                    # الصور المتغيرة تأخذ صفاً جديداً؛ الصف القديم يبقى غير مستخدم
+                    self._entries[key] = {'row': self._rows + offset, 'file': self._fingerprint(path)}
+                self._rows += len(keys)
+                self._save_index()
+
+        return len(missing)
+
+    def features(self):
+        """كل الميزات كـ memmap للقراءة فقط (N_rows, dim)"""
+        if not self._rows:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(self.features_path, dtype=np.float32, mode='r', shape=(self._rows, self.dim))
+
+    def get(self, keys):
+        """ميزات المفاتيح المطلوبة بالترتيب (N, dim)"""
+        rows = [self._entries[key]['row'] for key in keys]
+        return np.asarray(self.features()[rows])
@@ -1,3 +1,11 @@
+from types import MappingProxyType
+
+import numpy as np
+
+# ترتيب الفئات (يُستخدم كفهرس في جدول البحث)
+CATEGORIES = ('normal', 'elevated', 'high_stage1', 'high_stage2', 'crisis')
+
+
 class HealthRecommendationsAI:
     """AI model for health recommendations based on blood pressure"""
     
@@ -45,20 +53,73 @@ class HealthRecommendationsAI:
                 'اتصل برقم الطوارئ 911',
             ],
         }
+        
+        # جدول بحث مسبق الحساب: لكل (فئة، علامات التخصيص) نتيجة ثابتة مشتركة
+        self._lookup = self._build_lookup()
+    
+    def _build_lookup(self):
+        """
+        بناء جدول النتائج لكل الفئات وكل تركيبات علامات التخصيص (5 × 8)
+        النتائج غير قابلة للتعديل وتُشارك بين جميع الاستدعاءات
+        """
+        lookup = []
+        for category in CATEGORIES:
+            base = tuple(self.recommendations_db.get(category, []))
+            for flags in range(8):
+                personalized = self._personalized_for_flags(
+                    bool(flags & 4), bool(flags & 2), bool(flags & 1)
+                )
+                lookup.append(MappingProxyType({
+                    'category': category,
+                    'recommendations': base + tuple(personalized),
+                    'severity': self._get_severity(category),
+                }))
+        return tuple(lookup)
+    
+    def _lookup_index(self, systolic, diastolic):
+        """فهرس النتيجة في جدول البحث"""
+        category_index = CATEGORIES.index(self._categorize_bp(systolic, diastolic))
+        systolic_high, diastolic_high, very_high = self._personalization_flags(
+            systolic, diastolic
+        )
+        return category_index * 8 + systolic_high * 4 + diastolic_high * 2 + very_high
     
     def get_recommendations(self, systolic, diastolic):
-        """Get AI-powered health recommendations based on blood pressure"""
-        category = self._categorize_bp(systolic, diastolic)
-        recommendations = self.recommendations_db.get(category, [])
+        """
+        Get AI-powered health recommendations based on blood pressure
         
-        # Add personalized recommendations based on values
-        personalized = self._get_personalized_recommendations(systolic, diastolic)
+        Returns a shared read-only mapping from the precomputed lookup table
+        ('recommendations' is a tuple); do not try to modify it.
+        """
+        return self._lookup[self._lookup_index(systolic, diastolic)]
+    
+    def get_recommendations_batch(self, systolic, diastolic):
+        """
+        Vectorized get_recommendations for sequences of readings
+        Returns a list of shared read-only mappings, one per reading
+        """
+        systolic = np.asarray(systolic, dtype=np.float64)
+        diastolic = np.asarray(diastolic, dtype=np.float64)
         
-        return {
-            'category': category,
-            'recommendations': recommendations + personalized,
-            'severity': self._get_severity(category),
-        }
+        # Same thresholds as _categorize_bp, evaluated in order
+        category_index = np.select(
+            [
+                (systolic < 120) & (diastolic < 80),
+                (systolic < 130) & (diastolic < 80),
+                (systolic < 140) | (diastolic < 90),
+                (systolic < 180) | (diastolic < 120),
+            ],
+            [0, 1, 2, 3],
+            default=4,
+        )
+        # Same flags as _personalization_flags
+        index = (
+            category_index * 8
+            + (systolic > 140) * 4
+            + (diastolic > 90) * 2
+            + ((systolic > 160) | (diastolic > 100))
+        )
+        return [self._lookup[i] for i in index.tolist()]
     
     def _categorize_bp(self, systolic, diastolic):
         """Categorize blood pressure reading"""
@@ -84,24 +145,38 @@ class HealthRecommendationsAI:
         }
         return severity_map.get(category, 'unknown')
     
+    def _personalization_flags(self, systolic, diastolic):
+        """Flags that drive personalized recommendations"""
+        return (
+            systolic > 140,
+            diastolic > 90,
+            systolic > 160 or diastolic > 100,
+        )
+    
     def _get_personalized_recommendations(self, systolic, diastolic):
         """Get personalized recommendations based on specific values"""
+        return self._personalized_for_flags(
+            *self._personalization_flags(systolic, diastolic)
+        )
+    
+    def _personalized_for_flags(self, systolic_high, diastolic_high, very_high):
+        """Personalized recommendations for a combination of flags"""
         recommendations = []
         
         # Systolic-specific recommendations
-        if systolic > 140:
+        if systolic_high:
             recommendations.append('الضغط الانقباضي مرتفع - راجع الطبيب قريباً')
         
-        if diastolic > 90:
+        if diastolic_high:
             recommendations.append('الضغط الانبساطي مرتفع - يحتاج متابعة')
         
         # Combined recommendations
-        if systolic > 160 or diastolic > 100:
+        if very_high:
             recommendations.append('يُنصح بقياس ضغط الدم عدة مرات يومياً')
             recommendations.append('تجنب الأنشطة الشاقة')
         
         # Lifestyle recommendations based on severity
-        if systolic > 140 or diastolic > 90:
+        if systolic_high or diastolic_high:
             recommendations.append('قلل من الأطعمة المصنعة')
             recommendations.append('تناول المزيد من الخضروات والفواكه')
             recommendations.append('اشرب الماء بكميات كافية (8 أكواب يومياً)')
@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+
+class InferenceBatcher:
+    """
+    جدولة دفعات ديناميكية أمام BloodPressureCNN.predict_batch
+
+    تُجمع الطلبات المتزامنة حتى الوصول إلى max_batch_size أو انتهاء
+    max_wait_ms، ثم تُنفذ تمريرة واحدة للنموذج على الدفعة كاملة
+    ويستلم كل طلب نتيجته الخاصة.
+
+    on_batch: دالة اختيارية تُستدعى بعد كل دفعة بـ
+    (batch_size, queue_waits, predict_seconds) لأغراض المراقبة
+    """
+
+    def __init__(self, model, max_batch_size=16, max_wait_ms=5.0, executor=None, on_batch=None):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.executor = executor
+        self.on_batch = on_batch
+
+        self._queue = None
+        self._worker = None
+
+        # إحصائيات
+        self._batches = 0
+        self._requests = 0
+        self._errors = 0
+        self._batch_sizes = Counter()
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    async def start(self):
+        """تشغيل عامل الدفعات على الـ event loop الحالي"""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """إيقاف العامل وإلغاء أي طلبات منتظرة"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def submit(self, image):
+        """
+        إرسال صورة معالجة (1, 224, 224, 3) وانتظار نتيجتها
+        يُرجع {'systolic', 'diastolic'}
+        """
+        if self._worker is None:
+            raise RuntimeError("InferenceBatcher is not started")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _collect_batch(self):
+        """انتظار أول طلب ثم جمع المزيد حتى الحد الأقصى أو انتهاء المهلة"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # أخذ ما هو متاح فوراً دون انتظار
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+
+            # تجاهل الطلبات التي أُلغيت أثناء الانتظار
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            for wait in waits:
+                self._record_wait(wait)
+            self._batches += 1
+            self._requests += len(batch)
+            self._batch_sizes[len(batch)] += 1
+
+            images = np.concatenate([item[0] for item in batch], axis=0)
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.model.predict_batch, images
+                )
+            except Exception as e:
+                self._errors += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            if self.on_batch is not None:
+                self.on_batch(len(batch), waits, time.perf_counter() - started)
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record_wait(self, wait):
+        self._queue_wait_total += wait
+        self._queue_wait_max = max(self._queue_wait_max, wait)
+        self._recent_waits.append(wait)
+
+    def stats(self):
+        """إحصائيات حجم الدفعات وزمن الانتظار في الطابور"""
+        recent = sorted(self._recent_waits)
+
+        def percentile(p):
+            if not recent:
+                return 0.0
+            index = min(len(recent) - 1, int(round(p * (len(recent) - 1))))
+            return round(recent[index] * 1000, 3)
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "requests": self._requests,
+            "errors": self._errors,
+            "avg_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "queue_wait_ms": {
+                "avg": round(self._queue_wait_total / self._requests * 1000, 3) if self._requests else 0.0,
+                "max": round(self._queue_wait_max * 1000, 3),
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+            },
+        }
@@ -0,0 +1,150 @@
+"""
+صيغة بيانات تدريب مضغوطة مسبقاً (packed) تُقرأ عبر memmap
+
+pack_dataset.py يحول labels.csv + images/ إلى shards من مصفوفات .npy:
+- shard-XXXXX.images.npy: uint8 (N, 224, 224, 3) RGB بعد تغيير الحجم
+- shard-XXXXX.labels.npy: float32 (N, 2) systolic, diastolic
+مع index.json يحتوي أسماء الصور وعدد صفوف كل shard وبصمة labels.csv.
+
+القراءة عبر np.load(mmap_mode='r') بدون نسخ وبدون فك ترميز JPEG،
+فيصبح تحميل البيانات قراءة من الـ page cache.
+"""
+import json
+import os
+import zlib
+
+import numpy as np
+
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+IMAGE_SIZE = (224, 224)
+
+
+def labels_fingerprint(labels_path):
+    """crc32 لمحتوى labels.csv لمعرفة ما إذا كانت الـ shards محدثة"""
+    with open(labels_path, 'rb') as f:
+        return f"{zlib.crc32(f.read()):08x}"
+
+
+def default_packed_dir(train_data_dir):
+    return os.path.join(train_data_dir, 'packed')
+
+
+def write_index(directory, index):
+    path = os.path.join(directory, INDEX_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+class PackedDataset:
+    """
+    قراءة shards المضغوطة مسبقاً:
+        packed = PackedDataset(directory)
+        images, labels = packed.take(indices)   # uint8 / float32
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE), encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported packed dataset version in {directory}")
+
+        self.names = []
+        self._images = []
+        self._labels = []
+        for shard in self.index['shards']:
+            self.names.extend(shard['names'])
+            self._images.append(np.load(os.path.join(directory, shard['images']), mmap_mode='r'))
+            self._labels.append(np.load(os.path.join(directory, shard['labels']), mmap_mode='r'))
+
+        counts = [len(shard['names']) for shard in self.index['shards']]
+        # بداية كل shard في الترقيم العام
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    @classmethod
+    def open_if_current(cls, train_data_dir, directory=None):
+        """
+        فتح الـ shards إذا كانت موجودة ومطابقة لـ labels.csv الحالي، وإلا None
+        """
+        directory = directory or default_packed_dir(train_data_dir)
+        if not os.path.exists(os.path.join(directory, INDEX_FILE)):
+            return None
+        packed = cls(directory)
+        labels_path = os.path.join(train_data_dir, 'labels.csv')
+        if packed.index.get('labels_fingerprint') != labels_fingerprint(labels_path):
+            print(f"⚠️ البيانات المضغوطة في {directory} قديمة، شغّل pack_dataset.py لتحديثها")
+            return None
+        return packed
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    @property
+    def labels(self):
+        """كل القيم (N, 2) float32"""
+        if len(self._labels) == 1:
+            return self._labels[0]
+        return np.concatenate(self._labels) if self._labels else np.empty((0, 2), np.float32)
+
+    def take(self, indices):
+        """
+        (images, labels) للصفوف المطلوبة بالترتيب
+        النطاق المتصل داخل shard واحد يُرجع views على الـ memmap بدون نسخ
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return (np.empty((0,) + IMAGE_SIZE + (3,), np.uint8), np.empty((0, 2), np.float32))
+
+        shards = np.searchsorted(self._offsets, indices, side='right') - 1
+        if shards[0] == shards[-1]:
+            local = indices - self._offsets[shards[0]]
+            if np.all(np.diff(local) == 1):
+                start, stop = int(local[0]), int(local[-1]) + 1
+                return self._images[shards[0]][start:stop], self._labels[shards[0]][start:stop]
+
+        images = np.empty((len(indices),) + IMAGE_SIZE + (3,), np.uint8)
+        labels = np.empty((len(indices), 2), np.float32)
+        for shard in np.unique(shards):
+            mask = shards == shard
+            local = indices[mask] - self._offsets[shard]
+            images[mask] = self._images[shard][local]
+            labels[mask] = self._labels[shard][local]
+        return images, labels
+
+    def to_tf_dataset(self, indices, batch_size=32, training=False, augment=True, seed=None):
+        """
+        tf.data.Dataset من الصفوف المطلوبة، بنفس مخرجات data_pipeline.make_dataset
+        (صور float32 [0, 1] وقيم float32 (N, 2))
+        """
+        import tensorflow as tf
+        from models.data_pipeline import AUTOTUNE, build_augmenter, normalize
+
+        indices = np.asarray(indices, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+
+        def batches():
+            order = rng.permutation(indices) if training else indices
+            for start in range(0, len(order), batch_size):
+                # الترتيب داخل الدفعة لقراءة متتالية من الـ memmap
+                yield self.take(np.sort(order[start:start + batch_size]))
+
+        dataset = tf.data.Dataset.from_generator(
+            batches,
+            output_signature=(
+                tf.TensorSpec(shape=(None,) + IMAGE_SIZE + (3,), dtype=tf.uint8),
+                tf.TensorSpec(shape=(None, 2), dtype=tf.float32),
+            ),
+        )
+        dataset = dataset.map(lambda images, y: (normalize(images), y), num_parallel_calls=AUTOTUNE)
+
+        if training and augment:
+            augmenter = build_augmenter(seed)
+            dataset = dataset.map(
+                lambda images, y: (augmenter(images, training=True), y),
+                num_parallel_calls=AUTOTUNE,
+            )
+
+        return dataset.prefetch(AUTOTUNE)
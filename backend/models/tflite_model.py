@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+# tflite_runtime أخف بكثير من TensorFlow الكامل - نستخدمه إن كان مثبتاً
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+
+
+class TFLiteModel:
+    """
+    تشغيل نموذج TFLite (ناتج export_model.py) بنفس واجهة نموذج Keras
+    المستخدمة في BloodPressureCNN (predict_on_batch)
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # الـ Interpreter غير آمن للاستخدام من عدة خيوط
+        self._lock = threading.Lock()
+
+    def _quantize(self, images):
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return images.astype(np.float32, copy=False)
+        scale, zero_point = self._input['quantization']
+        return np.clip(
+            np.round(images / scale + zero_point),
+            np.iinfo(dtype).min, np.iinfo(dtype).max
+        ).astype(dtype)
+
+    def _dequantize(self, outputs):
+        if self._output['dtype'] == np.float32:
+            return outputs
+        scale, zero_point = self._output['quantization']
+        return (outputs.astype(np.float32) - zero_point) * scale
+
+    def predict_on_batch(self, images):
+        """images: (N, 224, 224, 3) float32 -> (N, 2)"""
+        with self._lock:
+            if len(images) != self._batch_size:
+                self.interpreter.resize_tensor_input(
+                    self._input['index'], [len(images), *self._input['shape'][1:]]
+                )
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = len(images)
+
+            self.interpreter.set_tensor(self._input['index'], self._quantize(images))
+            self.interpreter.invoke()
+            outputs = self.interpreter.get_tensor(self._output['index'])
+            return self._dequantize(outputs)
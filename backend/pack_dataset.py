@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+سكريبت لتحويل بيانات التدريب (labels.csv + images/) إلى shards مضغوطة مسبقاً
+
+Usage:
+    python pack_dataset.py                      # data/train -> data/train/packed
+    python pack_dataset.py --shard-size 2048
+
+كل shard يحتوي صور 224x224 uint8 جاهزة وقيمها، وتُقرأ عبر memmap بدون
+فك ترميز JPEG. train_model.py و export_model.py يستخدمانها تلقائياً
+إذا كانت مطابقة لـ labels.csv الحالي.
+"""
+import sys
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# إضافة مسار backend إلى Python path
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, backend_dir)
+
+import numpy as np
+
+from models.blood_pressure_model import BloodPressureCNN
+from models.data_pipeline import load_labels
+from models.packed_dataset import (
+    IMAGE_SIZE,
+    INDEX_FILE,
+    INDEX_VERSION,
+    default_packed_dir,
+    labels_fingerprint,
+    write_index,
+)
+
+DEFAULT_SHARD_SIZE = 1024
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def pack_dataset(train_data_dir, output_dir=None, shard_size=DEFAULT_SHARD_SIZE, workers=DEFAULT_WORKERS):
+    """تحويل labels.csv + images/ إلى shards مع index.json"""
+    labels_df, images_dir = load_labels(train_data_dir)
+    output_dir = output_dir or default_packed_dir(train_data_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    # إزالة الفهرس القديم أولاً: الـ shards غير صالحة حتى ينتهي هذا التشغيل
+    index_path = os.path.join(output_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    fingerprint = labels_fingerprint(os.path.join(train_data_dir, 'labels.csv'))
+
+    print(f"✅ تم العثور على {len(labels_df)} صورة في labels.csv")
+
+    preprocessor = BloodPressureCNN()
+
+    def load(name):
+        try:
+            return preprocessor.load_pixels(os.path.join(images_dir, name))
+        except ValueError:
+            return None
+
+    rows = list(labels_df[['image_name', 'systolic', 'diastolic']].itertuples(index=False))
+    shards = []
+    skipped = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for shard_number, start in enumerate(range(0, len(rows), shard_size)):
+            chunk = rows[start:start + shard_size]
+            # cv2 يحرر الـ GIL أثناء فك الترميز وتغيير الحجم
+            pixels = list(pool.map(load, [row.image_name for row in chunk]))
+            valid = [(row, img) for row, img in zip(chunk, pixels) if img is not None]
+            for row, img in zip(chunk, pixels):
+                if img is None:
+                    print(f"⚠️ تعذر قراءة الصورة: {row.image_name}")
+            skipped += len(chunk) - len(valid)
+            if not valid:
+                continue
+
+            images_name = f"shard-{shard_number:05d}.images.npy"
+            labels_name = f"shard-{shard_number:05d}.labels.npy"
+            images = np.lib.format.open_memmap(
+                os.path.join(output_dir, images_name), mode='w+',
+                dtype=np.uint8, shape=(len(valid),) + IMAGE_SIZE + (3,),
+            )
+            for i, (_, img) in enumerate(valid):
+                images[i] = img
+            images.flush()
+            del images
+
+            labels = np.array([(row.systolic, row.diastolic) for row, _ in valid], dtype=np.float32)
+            np.save(os.path.join(output_dir, labels_name), labels)
+
+            shards.append({
+                'images': images_name,
+                'labels': labels_name,
+                'names': [row.image_name for row, _ in valid],
+            })
+            print(f"📦 shard {shard_number}: {len(valid)} صورة")
+
+    # الفهرس يُكتب أخيراً حتى لا تُستخدم shards نصف مكتوبة
+    write_index(output_dir, {
+        'version': INDEX_VERSION,
+        'image_size': list(IMAGE_SIZE),
+        'labels_fingerprint': fingerprint,
+        'shards': shards,
+    })
+
+    # حذف shards قديمة من تشغيل سابق بعدد أكبر
+    current = {INDEX_FILE} | {s['images'] for s in shards} | {s['labels'] for s in shards}
+    for name in os.listdir(output_dir):
+        if name.startswith('shard-') and name not in current:
+            os.remove(os.path.join(output_dir, name))
+
+    total = sum(len(s['names']) for s in shards)
+    print(f"\n✅ تم حفظ {total} صورة في {len(shards)} shard (تم تخطي {skipped})")
+    print(f"📁 {output_dir}")
+    return output_dir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="تحويل بيانات التدريب إلى shards مضغوطة مسبقاً")
+    parser.add_argument('--data-dir', default=os.path.join(backend_dir, 'data', 'train'),
+                        help="مجلد يحتوي images/ و labels.csv")
+    parser.add_argument('--output-dir', default=None,
+                        help="مجلد الـ shards (الافتراضي: <data-dir>/packed)")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                        help="عدد الصور في كل shard")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("=" * 60)
+    print("📦 تحويل بيانات التدريب إلى shards")
+    print("=" * 60)
+    pack_dataset(args.data_dir, args.output_dir, shard_size=args.shard_size, workers=args.workers)
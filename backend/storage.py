@@ -0,0 +1,233 @@
+"""
+تخزين الصور المرفوعة حسب المحتوى (content-addressed)
+
+كل صورة تُخزن مرة واحدة باسم sha256 لمحتواها، موزعة على مجلدات فرعية
+(uploads/ab/cd/abcd...) حتى لا يتجمع ملايين الملفات في مجلد واحد.
+الكتابة ذرية (ملف مؤقت في نفس المجلد ثم os.replace)، ورفع نفس البايتات
+مرة أخرى لا يكتب شيئاً بل يزيد عداد المراجع في جدول blobs.
+
+image_path في measurements و training_data يحمل مفتاح الـ blob (sha256 hex).
+القيم القديمة (مسارات ملفات قبل هذا التخزين) تبقى قابلة للقراءة عبر resolve().
+
+بجانب كل blob تُحفظ نسخة 224x224 PNG (<key>.224.png، انظر models/derivatives.py)
+يستخدمها النموذج والمصدّر. الأصل نفسه اختياري (ARCHIVE_ORIGINAL_UPLOADS).
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from database import Blob
+from models.derivatives import DERIVATIVE_SUFFIX, derivative_path, encode_derivative, find_derivative
+
+load_dotenv()
+
+backend_dir = Path(__file__).resolve().parent
+
+UPLOAD_DIR = Path(os.getenv('UPLOAD_DIR', backend_dir / 'uploads'))
+# ab/cd/<key>: 65536 مجلد نهائي، أي ~15 ملف لكل مجلد عند مليون صورة
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+# حفظ الصورة الأصلية كاملة بجانب النسخة المصغرة
+ARCHIVE_ORIGINAL_UPLOADS = os.getenv('ARCHIVE_ORIGINAL_UPLOADS', 'true').lower() not in ('0', 'false', 'no')
+
+BLOB_KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def blob_key(data):
+    """مفتاح الـ blob: sha256 hex لمحتوى الملف"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_blob_key(path, chunk_size=1024 * 1024):
+    """مفتاح الـ blob لملف على القرص بدون تحميله كاملاً في الذاكرة"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_blob_key(value):
+    return bool(value) and BLOB_KEY_RE.match(value) is not None
+
+
+class BlobStore:
+    """
+    store = BlobStore(UPLOAD_DIR)
+    key, written = store.put(data)      # written=False إذا كان المحتوى موجوداً
+    store.put_upload(data, pixels, key)  # الأصل (اختياري) + النسخة 224x224
+    path = store.resolve(image_path)     # مفتاح blob أو مسار قديم -> Path
+    """
+
+    def __init__(self, root=UPLOAD_DIR, archive_originals=ARCHIVE_ORIGINAL_UPLOADS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.archive_originals = archive_originals
+
+    def path(self, key):
+        shards = [key[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+        return self.root.joinpath(*shards, key)
+
+    def derivative_path(self, key):
+        return Path(derivative_path(self.path(key)))
+
+    def exists(self, key):
+        return self.path(key).exists() or self.derivative_path(key).exists()
+
+    @staticmethod
+    def _write_atomic(path, data):
+        """
+        الملف إما غير موجود أو كامل: لا يرى القارئ ملفاً نصف مكتوب أبداً
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # mkstemp ينشئ الملف بصلاحيات 0600
+                os.fchmod(f.fileno(), 0o644)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # رفعان متزامنان لنفس المحتوى يكتبان نفس البايتات، والأخير يفوز
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def put(self, data, key=None):
+        """حفظ البايتات الأصلية إن لم تكن موجودة. يُرجع (key, written)"""
+        key = key or blob_key(data)
+        path = self.path(key)
+        if path.exists():
+            return key, False
+        self._write_atomic(path, data)
+        return key, True
+
+    def put_derivative(self, key, pixels):
+        """حفظ النسخة 224x224 (uint8 RGB من load_pixels) إن لم تكن موجودة"""
+        path = self.derivative_path(key)
+        if path.exists():
+            return False
+        self._write_atomic(path, encode_derivative(pixels))
+        return True
+
+    def put_upload(self, data, pixels, key=None):
+        """
+        مرحلة الحفظ عند الرفع: النسخة المصغرة دائماً، والأصل إذا كانت الأرشفة مفعلة
+        يُرجع (key, written)
+        """
+        key = key or blob_key(data)
+        written = self.put_derivative(key, pixels)
+        if self.archive_originals:
+            written = self.put(data, key)[1] or written
+        return key, written
+
+    def put_file(self, source, key=None):
+        """
+        نقل ملف موجود إلى المخزن (hardlink إن أمكن وإلا نسخ). يُرجع (key, written)
+        """
+        key = key or file_blob_key(source)
+        path = self.path(key)
+        if path.exists():
+            return key, False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".tmp-{key}-{os.getpid()}")
+        try:
+            os.link(source, tmp)
+        except OSError:
+            with open(source, 'rb') as f:
+                return self.put(f.read(), key)
+        os.replace(tmp, path)
+        return key, True
+
+    def delete(self, key):
+        for path in (self.path(key), self.derivative_path(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def resolve(self, image_path):
+        """
+        مسار الملف لقيمة image_path: مفتاح blob، أو مسار قديم
+        (المسارات النسبية القديمة كانت نسبة لمجلد backend)
+        """
+        if is_blob_key(image_path):
+            path = self.path(image_path)
+            if not path.exists() and self.derivative_path(image_path).exists():
+                # الأصل غير مؤرشف: النسخة المصغرة هي كل ما لدينا
+                return self.derivative_path(image_path)
+            return path
+        path = Path(image_path)
+        if not path.is_absolute() and not path.exists():
+            path = backend_dir / path
+        return path
+
+    def export_source(self, image_path, originals=False):
+        """الملف الذي يُصدَّر لصف تدريب: النسخة المصغرة إن وُجدت ما لم يُطلب الأصل"""
+        source_path = self.resolve(image_path)
+        if not originals:
+            source_path = Path(find_derivative(source_path) or source_path)
+        return source_path
+
+    def iter_keys(self):
+        """كل مفاتيح الـ blobs الموجودة على القرص (أصل أو نسخة مصغرة)"""
+        pattern = '/'.join(['*'] * SHARD_DEPTH + ['*'])
+        seen = set()
+        for path in self.root.glob(pattern):
+            key = path.name
+            if key.endswith(DERIVATIVE_SUFFIX):
+                key = key[:-len(DERIVATIVE_SUFFIX)]
+            if is_blob_key(key) and key not in seen:
+                seen.add(key)
+                yield key
+
+
+def training_image_name(row_id, source_path):
+    """اسم الصورة في تصدير بيانات التدريب (labels.csv و images/)"""
+    extension = '.png' if Path(source_path).name.endswith(DERIVATIVE_SUFFIX) else '.jpg'
+    return f"training_{row_id:05d}{extension}"
+
+
+def blob_ref_rows(blobs):
+    """
+    صفوف جدول blobs من قائمة (key, size)، مع تجميع المفاتيح المكررة
+    (صورتان متطابقتان في نفس الطلب = مرجعان)
+    """
+    counts = Counter()
+    sizes = {}
+    for key, size in blobs:
+        counts[key] += 1
+        sizes[key] = size
+    now = datetime.utcnow()
+    return [
+        {'key': key, 'size': sizes[key], 'refcount': count, 'created_at': now}
+        for key, count in counts.items()
+    ]
+
+
+def add_blob_refs_statement(dialect_name):
+    """
+    INSERT ... ON DUPLICATE KEY / ON CONFLICT يزيد refcount في نفس المعاملة
+    التي تُدرج صفوف measurements / training_data
+    """
+    if dialect_name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(Blob)
+        return stmt.on_duplicate_key_update(refcount=Blob.refcount + stmt.inserted.refcount)
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(Blob)
+        return stmt.on_conflict_do_update(
+            index_elements=[Blob.key],
+            set_={'refcount': Blob.refcount + stmt.excluded.refcount},
+        )
+    raise ValueError(f"Unsupported database dialect for blob refcounts: {dialect_name}")
@@ -4,6 +4,7 @@
 """
 import sys
 import os
+import argparse
 
 # إضافة مسار backend إلى Python path
 backend_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,7 +12,29 @@ sys.path.insert(0, backend_dir)
 
 from models.blood_pressure_model import BloodPressureCNN
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="تدريب نموذج قياس ضغط الدم")
+    parser.add_argument('--epochs', type=int, default=None,
+                        help="عدد الـ epochs (الافتراضي: 50، أو 5 مع --incremental)")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--cache', default=None,
+                        help="تخزين الصور المفكوكة بين الـ epochs: 'memory' أو مسار ملف على القرص")
+    parser.add_argument('--head-only', action='store_true',
+                        help="تدريب الـ head فقط على ميزات VGG16 مخزنة (أسرع بكثير، بدون تكبير بيانات)")
+    parser.add_argument('--feature-store', default=None,
+                        help="مجلد مخزن الميزات (الافتراضي: data/train/features)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="ضبط النموذج الحالي على البيانات الجديدة منذ آخر تدريب فقط")
+    parser.add_argument('--replay-ratio', type=float, default=1.0,
+                        help="عدد صور الإعادة من البيانات القديمة لكل صورة جديدة (مع --incremental)")
+    parser.add_argument('--learning-rate', type=float, default=1e-4,
+                        help="معدل التعلم للتدريب التزايدي")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="مجلد نقاط الاستئناف (الافتراضي: بجانب ملف النموذج)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("=" * 60)
     print("🎯 تدريب نموذج قياس ضغط الدم")
     print("=" * 60)
@@ -49,11 +72,32 @@ def main():
     try:
         # التدريب
         print(f"\n📂 مجلد البيانات: {train_data_dir}")
-        history = model.train(
-            train_data_dir=train_data_dir,
-            epochs=50,  # يمكنك تغيير هذا
-            batch_size=32
-        )
+        if args.incremental:
+            history = model.fine_tune(
+                train_data_dir=train_data_dir,
+                epochs=args.epochs or 5,
+                batch_size=args.batch_size,
+                replay_ratio=args.replay_ratio,
+                learning_rate=args.learning_rate,
+                checkpoint_dir=args.checkpoint_dir,
+            )
+            if history is None:
+                return
+        elif args.head_only:
+            history = model.train_head(
+                train_data_dir=train_data_dir,
+                epochs=args.epochs or 50,
+                batch_size=args.batch_size,
+                feature_store_dir=args.feature_store,
+            )
+        else:
+            history = model.train(
+                train_data_dir=train_data_dir,
+                epochs=args.epochs or 50,
+                batch_size=args.batch_size,
+                cache=args.cache,
+                checkpoint_dir=args.checkpoint_dir or model.default_checkpoint_dir(),
+            )
         
         print("\n" + "=" * 60)
         print("✅ تم التدريب بنجاح!")
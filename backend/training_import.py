@@ -0,0 +1,423 @@
+"""
+استيراد بيانات تدريب بالجملة من أرشيف zip / tar يحتوي labels.csv والصور
+
+    importer = ArchiveImport(path, user_id)    # قراءة labels.csv والتحقق من الصفوف
+    importer.start()                            # إنشاء سجل training_imports أو استئنافه
+    report = importer.run(load_pixels)          # الصور بالتوازي + إدراج على دفعات
+    importer.close()
+
+الأرشيف لا يُفك على القرص: كل صورة تُقرأ من الأرشيف بترتيب موقعها فيه
+(قراءة متتالية حتى في tar.gz) وتُمرر لمجمع خيوط يفك ترميزها ويحفظها مع
+نسختها 224x224 في مخزن الصور (storage.py). صفوف training_data تُدرج
+بـ executemany على دفعات، وكل دفعة معاملة واحدة مع عدادات blobs
+و training_data_stats وتقدم الاستيراد، فتشغيل الاستيراد مرة أخرى بنفس
+الأرشيف يستأنف من آخر دفعة محفوظة بدون تكرار.
+"""
+import csv
+import hashlib
+import io
+import math
+import os
+import posixpath
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, engine, TrainingData, TrainingImport
+from storage import BlobStore, add_blob_refs_statement, blob_ref_rows, file_blob_key
+from training_stats import record_training_data
+
+IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', 500))
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+IMPORT_MAX_IMAGE_BYTES = int(os.getenv('IMPORT_MAX_IMAGE_BYTES', 20 * 1024 * 1024))
+IMPORT_MAX_ARCHIVE_BYTES = int(os.getenv('IMPORT_MAX_ARCHIVE_BYTES', 2 * 1024 * 1024 * 1024))
+
+LABELS_FILE = 'labels.csv'
+REQUIRED_COLUMNS = ('image_name', 'systolic', 'diastolic')
+SYSTOLIC_RANGE = (50.0, 260.0)
+DIASTOLIC_RANGE = (30.0, 160.0)
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportArchiveError(ValueError):
+    """أرشيف غير صالح: ليس zip / tar، أو بدون labels.csv صالح"""
+
+
+class ImportArchiveTooLarge(ImportArchiveError):
+    """الأرشيف المرفوع أكبر من IMPORT_MAX_ARCHIVE_BYTES"""
+
+
+class ImportConflictError(RuntimeError):
+    """استيراد آخر لنفس الأرشيف يتقدم في نفس الوقت"""
+
+
+class _ZipReader:
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path)
+        self.members = {
+            posixpath.normpath(info.filename): info
+            for info in self.archive.infolist() if not info.is_dir()
+        }
+
+    def position(self, name):
+        return self.members[name].header_offset
+
+    def size(self, name):
+        return self.members[name].file_size
+
+    def read(self, name):
+        return self.archive.read(self.members[name])
+
+    def close(self):
+        self.archive.close()
+
+
+class _TarReader:
+    def __init__(self, path):
+        self.archive = tarfile.open(path, 'r:*')
+        self.members = {
+            posixpath.normpath(member.name): member
+            for member in self.archive.getmembers() if member.isfile()
+        }
+
+    def position(self, name):
+        return self.members[name].offset_data
+
+    def size(self, name):
+        return self.members[name].size
+
+    def read(self, name):
+        with self.archive.extractfile(self.members[name]) as f:
+            return f.read()
+
+    def close(self):
+        self.archive.close()
+
+
+def open_archive(path):
+    if zipfile.is_zipfile(path):
+        return _ZipReader(path)
+    try:
+        if tarfile.is_tarfile(path):
+            return _TarReader(path)
+    except (OSError, tarfile.TarError):
+        pass
+    raise ImportArchiveError("الأرشيف يجب أن يكون zip أو tar")
+
+
+def spool_archive(fileobj, directory=None, chunk_size=1024 * 1024, max_bytes=IMPORT_MAX_ARCHIVE_BYTES):
+    """
+    نسخ الأرشيف المرفوع إلى ملف مؤقت مع حساب sha256 في نفس القراءة
+    يُرجع (path, sha256). يتوقف ويرفع ImportArchiveTooLarge إذا تجاوز max_bytes
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix='.archive', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImportArchiveTooLarge(f"حجم الأرشيف أكبر من الحد المسموح ({max_bytes} بايت)")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+@dataclass
+class ImportRow:
+    line: int                      # رقم السطر في labels.csv
+    image_name: str
+    member: Optional[str] = None
+    systolic: float = 0.0
+    diastolic: float = 0.0
+    error: Optional[str] = None    # سبب الرفض عند التحقق
+
+
+def _parse_value(value, valid_range):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number) or not valid_range[0] <= number <= valid_range[1]:
+        return None
+    return number
+
+
+def import_report(record, errors=None):
+    """حالة استيراد كـ dict (للـ API و CLI)"""
+    report = {
+        'import_id': record.id,
+        'archive_name': record.archive_name,
+        'status': record.status,
+        'rows_total': record.rows_total,
+        'rows_done': record.rows_done,
+        'rows_imported': record.rows_imported,
+        'rows_rejected': record.rows_rejected,
+        'error': record.error,
+        'created_at': record.created_at.isoformat() if record.created_at else None,
+        'updated_at': record.updated_at.isoformat() if record.updated_at else None,
+    }
+    if errors is not None:
+        report['errors'] = errors
+    return report
+
+
+class ArchiveImport:
+    """
+    استيراد أرشيف واحد. ترتيب الصفوف ثابت لنفس الأرشيف (المرفوضة أولاً ثم
+    حسب موقع الصورة في الأرشيف)، لذلك يكفي rows_done لمعرفة نقطة الاستئناف
+    """
+
+    def __init__(self, archive_path, user_id, archive_sha256=None, archive_name=None, verified=True):
+        self.archive_path = archive_path
+        self.user_id = user_id
+        self.archive_sha256 = archive_sha256 or file_blob_key(archive_path)
+        self.archive_name = archive_name or os.path.basename(archive_path)
+        self.is_verified = 1 if verified else 0
+        self.import_id = None
+        self.reader = open_archive(archive_path)
+        try:
+            self.rows = self._plan(self._read_labels())
+        except BaseException:
+            self.reader.close()
+            raise
+
+    def close(self):
+        self.reader.close()
+
+    def _read_labels(self):
+        candidates = [name for name in self.reader.members if posixpath.basename(name) == LABELS_FILE]
+        if not candidates:
+            raise ImportArchiveError("لا يوجد labels.csv في الأرشيف")
+        # الأقرب للجذر إذا وُجد أكثر من ملف
+        labels_name = min(candidates, key=lambda name: (name.count('/'), name))
+        self.base_dir = posixpath.dirname(labels_name)
+
+        try:
+            text = self.reader.read(labels_name).decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ImportArchiveError("labels.csv يجب أن يكون بترميز UTF-8")
+        reader = csv.DictReader(io.StringIO(text))
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ImportArchiveError(f"أعمدة ناقصة في labels.csv: {', '.join(missing)}")
+        return [(reader.line_num, row) for row in reader]
+
+    def _find_member(self, image_name):
+        for candidate in (
+            posixpath.join(self.base_dir, 'images', image_name),
+            posixpath.join(self.base_dir, image_name),
+        ):
+            candidate = posixpath.normpath(candidate)
+            if candidate in self.reader.members:
+                return candidate
+        return None
+
+    def _plan(self, labels):
+        rows = []
+        for line, label in labels:
+            image_name = (label.get('image_name') or '').strip()
+            row = ImportRow(line=line, image_name=image_name)
+            systolic = _parse_value(label.get('systolic'), SYSTOLIC_RANGE)
+            diastolic = _parse_value(label.get('diastolic'), DIASTOLIC_RANGE)
+            if not image_name:
+                row.error = "image_name فارغ"
+            elif systolic is None or diastolic is None:
+                row.error = "قيم ضغط الدم غير صالحة أو خارج النطاق"
+            elif systolic <= diastolic:
+                row.error = "الانقباضي يجب أن يكون أكبر من الانبساطي"
+            else:
+                row.member = self._find_member(image_name)
+                if row.member is None:
+                    row.error = "الصورة غير موجودة في الأرشيف"
+                elif self.reader.size(row.member) > IMPORT_MAX_IMAGE_BYTES:
+                    row.error = "حجم الصورة أكبر من الحد المسموح"
+                else:
+                    row.systolic, row.diastolic = systolic, diastolic
+            rows.append(row)
+
+        rejected = [row for row in rows if row.error]
+        accepted = sorted(
+            (row for row in rows if not row.error),
+            key=lambda row: (self.reader.position(row.member), row.line),
+        )
+        return rejected + accepted
+
+    def start(self):
+        """إنشاء سجل الاستيراد، أو استئناف سجل سابق لنفس الأرشيف والمستخدم"""
+        db = SessionLocal()
+        try:
+            record = self._find_record(db)
+            if record is None:
+                record = TrainingImport(
+                    user_id=self.user_id,
+                    archive_sha256=self.archive_sha256,
+                    archive_name=self.archive_name,
+                    status='running',
+                    rows_total=len(self.rows),
+                    rows_done=0,
+                    rows_imported=0,
+                    rows_rejected=0,
+                )
+                db.add(record)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # بدأ نفس الاستيراد في نفس اللحظة
+                    db.rollback()
+                    record = self._find_record(db)
+            elif record.status != 'completed':
+                record.status = 'running'
+                record.error = None
+                record.updated_at = datetime.utcnow()
+                db.commit()
+            self.import_id = record.id
+            return import_report(record)
+        finally:
+            db.close()
+
+    def _find_record(self, db):
+        return db.execute(
+            select(TrainingImport).where(
+                TrainingImport.user_id == self.user_id,
+                TrainingImport.archive_sha256 == self.archive_sha256,
+            )
+        ).scalar_one_or_none()
+
+    def run(self, load_pixels, blob_store=None, workers=IMPORT_WORKERS, chunk_rows=IMPORT_CHUNK_ROWS, progress=None):
+        """
+        استيراد الصفوف المتبقية. load_pixels(bytes) -> uint8 (224, 224, 3)
+        progress(report) يُستدعى بعد كل دفعة. يُرجع تقرير الاستيراد مع أول
+        MAX_REPORTED_ERRORS سبب رفض في هذا التشغيل
+        """
+        if self.import_id is None:
+            self.start()
+        blob_store = blob_store or BlobStore()
+        add_blob_refs = add_blob_refs_statement(engine.dialect.name)
+        errors = []
+
+        def reject(row, reason):
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': row.line, 'image_name': row.image_name, 'error': reason})
+
+        # حد للصور المقروءة التي تنتظر المعالجة حتى لا تتجمع دفعة كاملة في الذاكرة
+        in_flight = threading.BoundedSemaphore(max(1, workers) * 2)
+
+        def ingest(data):
+            try:
+                pixels = load_pixels(data)
+                key, _ = blob_store.put_upload(data, pixels)
+                return key
+            finally:
+                in_flight.release()
+
+        db = SessionLocal()
+        try:
+            record = db.get(TrainingImport, self.import_id)
+            if record.status == 'completed':
+                return import_report(record, errors)
+
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                for start in range(record.rows_done, len(self.rows), chunk_rows):
+                    chunk = self.rows[start:start + chunk_rows]
+
+                    pending = []
+                    for row in chunk:
+                        if row.error:
+                            pending.append(None)
+                            continue
+                        in_flight.acquire()
+                        try:
+                            data = self.reader.read(row.member)
+                        except BaseException:
+                            in_flight.release()
+                            raise
+                        pending.append((pool.submit(ingest, data), len(data)))
+
+                    values, refs, members, rejected = [], [], [], 0
+                    now = datetime.utcnow()
+                    rows = []
+                    for row, item in zip(chunk, pending):
+                        if item is None:
+                            rejected += 1
+                            reject(row, row.error)
+                            continue
+                        future, size = item
+                        try:
+                            key = future.result()
+                        except ValueError:
+                            rejected += 1
+                            reject(row, "تعذر قراءة الصورة")
+                            continue
+                        rows.append({
+                            'user_id': self.user_id,
+                            'image_path': key,
+                            'systolic': row.systolic,
+                            'diastolic': row.diastolic,
+                            'is_verified': self.is_verified,
+                            'created_at': now,
+                        })
+                        refs.append((key, size))
+                        members.append((key, row.member))
+                        values.append((row.systolic, row.diastolic))
+
+                    # الدفعة + العدادات + التقدم في معاملة واحدة. الشرط على rows_done
+                    # يمنع تشغيلين لنفس الاستيراد من إدراج نفس الدفعة مرتين
+                    claimed = db.execute(
+                        update(TrainingImport)
+                        .where(TrainingImport.id == self.import_id, TrainingImport.rows_done == start)
+                        .values(
+                            rows_done=start + len(chunk),
+                            rows_imported=TrainingImport.rows_imported + len(rows),
+                            rows_rejected=TrainingImport.rows_rejected + rejected,
+                            updated_at=now,
+                        )
+                    ).rowcount
+                    if claimed != 1:
+                        db.rollback()
+                        raise ImportConflictError("استيراد آخر لنفس الأرشيف قيد التنفيذ")
+                    if rows:
+                        db.execute(insert(TrainingData), rows)
+                        db.execute(add_blob_refs, blob_ref_rows(refs))
+                        db.execute(record_training_data(values, self.is_verified))
+                    db.commit()
+
+                    # إعادة كتابة الصور التي حذفها gc بين الحفظ و commit (نادر)
+                    for key, member in members:
+                        if not blob_store.derivative_path(key).exists():
+                            data = self.reader.read(member)
+                            blob_store.put_upload(data, load_pixels(data), key)
+
+                    if progress:
+                        db.refresh(record)
+                        progress(import_report(record))
+
+            record.status = 'completed'
+            record.updated_at = datetime.utcnow()
+            db.commit()
+            return import_report(record, errors)
+        except ImportConflictError:
+            raise
+        except Exception as e:
+            db.rollback()
+            db.execute(
+                update(TrainingImport)
+                .where(TrainingImport.id == self.import_id)
+                .values(status='failed', error=str(e)[:1000], updated_at=datetime.utcnow())
+            )
+            db.commit()
+            raise
+        finally:
+            db.close()
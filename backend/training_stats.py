@@ -0,0 +1,175 @@
+"""
+عدادات بيانات التدريب المحدثة تراكمياً (جدول training_data_stats)
+
+بدلاً من COUNT(*) و AVG/MIN/MAX على training_data في كل طلب، يوجد صف لكل
+حالة تحقق (0 = قيد الانتظار، 1 = محقق) يحمل العدد والمجاميع والحدود
+الدنيا/العليا لكل قياس. كل إدراج أو تغيير حالة يحدّث الصف في نفس المعاملة،
+فتقرأ /api/training-data/stats و check_training_data.py صفين فقط.
+
+    db.add(TrainingData(...))
+    db.execute(record_training_data([(systolic, diastolic)]))   # نفس المعاملة
+
+    set_verified(db, ids, 1)                                    # نقل بين الحالتين
+"""
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, TrainingData, TrainingDataStats
+
+STATUSES = (0, 1)
+MINIMUM_REQUIRED = 50
+
+FIELDS = ('systolic', 'diastolic')
+
+
+def _lower(column, value):
+    return case((column.is_(None), value), (column > value, value), else_=column)
+
+
+def _higher(column, value):
+    return case((column.is_(None), value), (column < value, value), else_=column)
+
+
+def record_training_data(values, is_verified=1):
+    """
+    UPDATE يضيف صفوف training_data جديدة إلى عدادات حالتها
+    values: قائمة (systolic, diastolic) غير فارغة
+    """
+    values = list(values)
+    columns = dict(zip(FIELDS, zip(*values)))
+    assignments = {
+        'count': TrainingDataStats.count + len(values),
+        'updated_at': datetime.utcnow(),
+    }
+    for field, column_values in columns.items():
+        assignments[f'sum_{field}'] = getattr(TrainingDataStats, f'sum_{field}') + float(sum(column_values))
+        assignments[f'min_{field}'] = _lower(getattr(TrainingDataStats, f'min_{field}'), float(min(column_values)))
+        assignments[f'max_{field}'] = _higher(getattr(TrainingDataStats, f'max_{field}'), float(max(column_values)))
+    return (
+        update(TrainingDataStats)
+        .where(TrainingDataStats.is_verified == is_verified)
+        .values(**assignments)
+    )
+
+
+def _remove_training_data(values, is_verified):
+    """
+    UPDATE يطرح صفوفاً من عدادات حالتها. الحدود الدنيا/العليا لا يمكن طرحها،
+    فتُعاد قراءتها من training_data (بعد تغيير الحالة في نفس المعاملة)
+    """
+    values = list(values)
+    assignments = {
+        'count': TrainingDataStats.count - len(values),
+        'updated_at': datetime.utcnow(),
+    }
+    remaining = TrainingData.is_verified == is_verified
+    for index, field in enumerate(FIELDS):
+        column = getattr(TrainingData, field)
+        assignments[f'sum_{field}'] = (
+            getattr(TrainingDataStats, f'sum_{field}') - float(sum(value[index] for value in values))
+        )
+        assignments[f'min_{field}'] = select(func.min(column)).where(remaining).scalar_subquery()
+        assignments[f'max_{field}'] = select(func.max(column)).where(remaining).scalar_subquery()
+    return (
+        update(TrainingDataStats)
+        .where(TrainingDataStats.is_verified == is_verified)
+        .values(**assignments)
+    )
+
+
+def set_verified(db, ids, is_verified=1):
+    """
+    تغيير حالة التحقق لصفوف training_data ونقل قيمها بين العدادات
+    في نفس المعاملة. يُرجع عدد الصفوف التي تغيرت حالتها (بدون commit)
+    """
+    previous = 1 - is_verified
+    changed = (
+        (TrainingData.id.in_(list(ids))) & (TrainingData.is_verified == previous)
+    )
+    values = db.execute(
+        select(TrainingData.systolic, TrainingData.diastolic).where(changed).with_for_update()
+    ).all()
+    if not values:
+        return 0
+    db.execute(update(TrainingData).where(changed).values(is_verified=is_verified))
+    db.execute(record_training_data(values, is_verified))
+    db.execute(_remove_training_data(values, previous))
+    return len(values)
+
+
+def rebuild_training_data_stats(db):
+    """إعادة بناء العدادات من training_data (استعلام تجميعي واحد، بدون commit)"""
+    aggregates = {
+        row.is_verified: row
+        for row in db.execute(
+            select(
+                TrainingData.is_verified,
+                func.count().label('count'),
+                func.sum(TrainingData.systolic).label('sum_systolic'),
+                func.sum(TrainingData.diastolic).label('sum_diastolic'),
+                func.min(TrainingData.systolic).label('min_systolic'),
+                func.max(TrainingData.systolic).label('max_systolic'),
+                func.min(TrainingData.diastolic).label('min_diastolic'),
+                func.max(TrainingData.diastolic).label('max_diastolic'),
+            ).group_by(TrainingData.is_verified)
+        )
+    }
+    now = datetime.utcnow()
+    rows = []
+    for status in STATUSES:
+        aggregate = aggregates.get(status)
+        row = {'is_verified': status, 'count': 0, 'sum_systolic': 0.0, 'sum_diastolic': 0.0, 'updated_at': now}
+        if aggregate is not None:
+            row.update({key: aggregate._mapping[key] for key in aggregate._mapping if key != 'is_verified'})
+        rows.append(row)
+
+    db.execute(delete(TrainingDataStats))
+    db.execute(insert(TrainingDataStats), rows)
+
+
+def ensure_training_data_stats():
+    """
+    بناء العدادات مرة واحدة إذا كان الجدول فارغاً (قاعدة بيانات جديدة أو قبل الترحيل)
+    يُستدعى عند بدء الخادم قبل أي إدراج
+    """
+    db = SessionLocal()
+    try:
+        existing = db.execute(select(func.count()).select_from(TrainingDataStats)).scalar_one()
+        if existing == len(STATUSES):
+            return
+        rebuild_training_data_stats(db)
+        db.commit()
+    except IntegrityError:
+        # عامل آخر بنى العدادات في نفس الوقت
+        db.rollback()
+    finally:
+        db.close()
+
+
+def summarize(stats_rows):
+    """
+    ملخص العدادات: الإجمالي والمحقق وقيد الانتظار، ومتوسط/نطاق كل قياس
+    للبيانات المحققة (None إذا لم توجد)
+    """
+    stats_rows = list(stats_rows)
+    by_status = {row.is_verified: row for row in stats_rows}
+    verified = by_status.get(1)
+    pending = by_status.get(0)
+    verified_count = verified.count if verified else 0
+    summary = {
+        'total': sum(row.count for row in stats_rows),
+        'verified': verified_count,
+        'pending': pending.count if pending else 0,
+    }
+    for field in FIELDS:
+        if not verified_count:
+            summary[field] = None
+            continue
+        summary[field] = {
+            'avg': round(getattr(verified, f'sum_{field}') / verified_count, 1),
+            'min': getattr(verified, f'min_{field}'),
+            'max': getattr(verified, f'max_{field}'),
+        }
+    return summary
@@ -0,0 +1,45 @@
+"""
+Cache of authenticated user principals, so get_current_user does not hit the
+database on every request. Entries are invalidated whenever a User row is
+updated or deleted through the ORM.
+"""
+import os
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+from caching import TTLCache
+from database import User
+
+load_dotenv()
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 300))
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """The fields of an authenticated user that request handlers need"""
+    id: int
+    name: str
+    email: str
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(id=user.id, name=user.name, email=user.email)
+
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id):
+    user_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    # Bulk query.update()/delete() statements bypass these events;
+    # call invalidate_user() explicitly after using them on users.
+    invalidate_user(target.id)
@@ -24,6 +24,67 @@ CREATE TABLE IF NOT EXISTS measurements (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     INDEX idx_user_id (user_id),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX ix_measurements_user_created_id (user_id, created_at, id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+
+-- ملاحظة: alembic upgrade head هو الطريقة المعتمدة لإنشاء وتحديث الجداول.
+-- الجداول التالية تطابق ترحيلات backend/alembic/versions لمن يُنشئ القاعدة يدوياً
+-- (جدول training_data في training_data_migration.sql)
+
+-- Blobs table: عدد المراجع لكل صورة في مخزن الصور (storage.py)
+CREATE TABLE IF NOT EXISTS blobs (
+    `key` VARCHAR(64) NOT NULL PRIMARY KEY COMMENT 'sha256 hex',
+    size INT NOT NULL,
+    refcount INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Refresh tokens table
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    token_hash VARCHAR(64) NOT NULL COMMENT 'HMAC-SHA256',
+    family_id VARCHAR(32) NOT NULL,
+    expires_at DATETIME NOT NULL,
+    revoked_at DATETIME NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_refresh_tokens_id (id),
+    INDEX ix_refresh_tokens_user_id (user_id),
+    UNIQUE INDEX ix_refresh_tokens_token_hash (token_hash),
+    INDEX ix_refresh_tokens_family_id (family_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Training data stats table: صف لكل حالة (0 = pending, 1 = verified)
+-- لا تُعبأ هنا: الخادم يبني العدادات من training_data عند البدء إذا كان الجدول فارغاً
+CREATE TABLE IF NOT EXISTS training_data_stats (
+    is_verified INT NOT NULL PRIMARY KEY,
+    count INT NOT NULL DEFAULT 0,
+    sum_systolic DOUBLE NOT NULL DEFAULT 0,
+    sum_diastolic DOUBLE NOT NULL DEFAULT 0,
+    min_systolic FLOAT NULL,
+    max_systolic FLOAT NULL,
+    min_diastolic FLOAT NULL,
+    max_diastolic FLOAT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Training imports table: تقدم استيراد الأرشيفات (training_import.py)
+CREATE TABLE IF NOT EXISTS training_imports (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    archive_sha256 VARCHAR(64) NOT NULL,
+    archive_name VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'running' COMMENT 'running / completed / failed',
+    rows_total INT NOT NULL DEFAULT 0,
+    rows_done INT NOT NULL DEFAULT 0,
+    rows_imported INT NOT NULL DEFAULT 0,
+    rows_rejected INT NOT NULL DEFAULT 0,
+    error TEXT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_training_imports_id (id),
+    INDEX ix_training_imports_user_id (user_id),
+    UNIQUE INDEX ux_training_imports_user_archive (user_id, archive_sha256)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;